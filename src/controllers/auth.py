@@ -1,13 +1,14 @@
 import sqlite3
-import sys
+import math
 import time
 from models.db import open_connection, close_connection
-from security.password_hashing import validate_password
+from security.password_hashing import validate_password, needs_rehash, get_bcrypt_cost, password_hasher
 from logs.log import log_instance
-from models.user import User
+from models.user import User, find_user_id
 from controllers.user_controller import change_own_password
-from models.user import clear_temporary_passwords
+from models.user import clear_temporary_passwords, rehash_password_by_id
 from security.validation import Validation
+from security.login_throttle import login_throttle
 from security.encryption import decrypt_message, load_symmetric_key
 from helpers.general_methods import general_methods
 
@@ -21,6 +22,7 @@ SUPER_ADMIN_PASSWORD = "Admin_123?"
 def login() -> User | None:
     """Main login function that handles the authentication flow."""
     key = load_symmetric_key()
+    _warm_dummy_hash()
     
     for attempt in range(MAX_ATTEMPTS):
         general_methods.clear_console()
@@ -41,7 +43,24 @@ def login() -> User | None:
 
 
 def _attempt_login(username: str, password: str, key: bytes) -> User | None:
-    """Attempt a single login with given credentials."""
+    """Attempt a single login with given credentials, unless the throttle says to wait."""
+    wait = login_throttle.retry_after(username)
+    if wait:
+        print(f"Too many failed login attempts. Try again in {math.ceil(wait)} seconds.")
+        log_instance.addlog(username, "Login refused", "Throttled after failed attempts", suspicious=True)
+        general_methods.hidden_input("\nPress Enter to continue...")
+        return None
+
+    user = _check_credentials(username, password, key)
+    if user:
+        login_throttle.record_success(username)
+    else:
+        login_throttle.record_failure(username)
+        general_methods.hidden_input("\nPress Enter to continue...")
+    return user
+
+
+def _check_credentials(username: str, password: str, key: bytes) -> User | None:
     # Check super admin first
     if username == SUPER_ADMIN_USERNAME:
         return _handle_super_admin_login(password)
@@ -71,7 +90,6 @@ def _handle_super_admin_login(password: str) -> User | None:
     else:
         print("Login failed.")
         log_instance.addlog("super_admin", "Login failed", "Invalid hardcoded password", suspicious=True)
-        time.sleep(2)
         return None
 
 
@@ -80,7 +98,6 @@ def _validate_credentials_format(username: str, password: str) -> bool:
     if not Validation.username_validation(username) or not Validation.password_validation(password, username):
         print("Login failed.")
         log_instance.log_invalid_input(username, "login", "Invalid login format")
-        time.sleep(2)
         return False
     return True
 
@@ -91,23 +108,25 @@ def _authenticate_database_user(username: str, password: str, key: bytes) -> Use
     try:
         user_id = _find_user_by_username(conn, username, key)
         if not user_id:
+            _dummy_password_check(password)
             print("Login failed.")
             log_instance.addlog(username, "Login failed", "Invalid credentials", suspicious=True)
-            time.sleep(2)
             return None
         
         user_data = _fetch_user_data(conn, user_id)
         if not user_data:
             print("Login failed.")
             log_instance.addlog(username, "Login failed", "User not found after matching id", suspicious=True)
-            time.sleep(2)
             return None
         
         if not validate_password(password, user_data['password']):
             print("Login failed.")
             log_instance.addlog(username, "Login failed", "Invalid credentials", suspicious=True)
-            time.sleep(2)
             return None
+
+        # Upgrade hashes made with another bcrypt cost; runs in the background
+        if needs_rehash(user_data['password']):
+            rehash_password_by_id(user_id, password, user_data['password'])
         
         return _create_authenticated_user(username, user_id, user_data, key)
     
@@ -116,20 +135,22 @@ def _authenticate_database_user(username: str, password: str, key: bytes) -> Use
 
 
 def _find_user_by_username(conn: sqlite3.Connection, username: str, key: bytes) -> int | None:
-    """Find user ID by decrypting and matching username."""
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, username FROM users")
-    all_users = cursor.fetchall()
-    
-    for user_id, encrypted_username in all_users:
-        try:
-            decrypted_username = decrypt_message(encrypted_username, key).lower()
-            if decrypted_username == username:
-                return user_id
-        except Exception:
-            continue
-    
-    return None
+    """Find user ID with one indexed lookup on the username blind index."""
+    return find_user_id(conn.cursor(), username, key)
+
+
+# Dummy hash per bcrypt cost, computed in the background while the login prompt is shown
+_dummy_hashes = {}
+
+def _warm_dummy_hash() -> None:
+    cost = get_bcrypt_cost()
+    if cost not in _dummy_hashes:
+        _dummy_hashes[cost] = password_hasher.submit_hash("unknown-user-placeholder")
+
+def _dummy_password_check(password: str) -> None:
+    """Spend one bcrypt check on unknown usernames so they take as long as a wrong password."""
+    _warm_dummy_hash()
+    validate_password(password, _dummy_hashes[get_bcrypt_cost()].result())
 
 
 def _fetch_user_data(conn: sqlite3.Connection, user_id: int) -> dict | None:
@@ -199,8 +220,7 @@ def _handle_temporary_password(user: User) -> User | None:
 
 
 def _handle_lockout(username: str) -> None:
-    """Handle user lockout after too many attempts."""
+    """Log a series of failed attempts; further attempts are delayed by the login throttle."""
     general_methods.clear_console()
-    print("Too many failed login attempts. You are now locked out.")
-    log_instance.addlog(username, "Login failed", "Too many attempts", suspicious=True)
-    sys.exit()
\ No newline at end of file
+    print("Too many failed login attempts.")
+    log_instance.addlog(username, "Login failed", "Too many attempts", suspicious=True)
\ No newline at end of file
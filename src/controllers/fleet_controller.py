@@ -0,0 +1,271 @@
+from datetime import datetime, timedelta
+from fleet.analytics import get_fleet_snapshot
+from fleet.charging import get_charging_scheduler, take_charging_jobs
+from fleet.maintenance import get_maintenance_scheduler
+from fleet.routing import plan_route
+from fleet.hotspots import rebalancing_report
+from fleet.geofence import get_geofences
+from fleet.battery_health import estimate_battery_health, flag_degraded_batteries, HEALTH_THRESHOLD, WINDOW_DAYS
+from models.scooter import get_scooter_by_id
+from models.scooter_history import get_scooter_history
+from logs.log import log_instance
+from controllers.rolecheck import require_authorization
+from helpers.general_methods import general_methods
+
+
+def show_fleet_stats(current_user):
+    require_authorization(current_user, 'fleet_stats')
+    general_methods.clear_console()
+    print("----------------------------------------------------------------------------")
+    print("|" + "Fleet Statistics".center(75) + "|")
+    print("----------------------------------------------------------------------------")
+
+    stats = get_fleet_snapshot().stats()
+    if not stats['count']:
+        print("No scooters found.")
+        general_methods.hidden_input("\nPress Enter to return to the scooter menu...")
+        return
+
+    print(f"Scooters: {stats['count']}")
+    print(f"Out of service: {stats['out_of_service_share'] * 100:.1f}%")
+    print(f"Below target SOC range: {stats['below_soc_target']} | Above target SOC range: {stats['above_soc_target']}")
+
+    print("\nState of charge distribution:")
+    for lower, upper, count in stats['soc_distribution']:
+        print(f"  {lower:>3}-{upper:<3}% {count:>7} {'#' * min(count, 50)}")
+
+    print("\nAverage mileage per brand:")
+    for brand, mileage in sorted(stats['average_mileage_per_brand'].items()):
+        print(f"  {brand:<30} {mileage:>12.1f} km")
+
+    log_instance.addlog(current_user.username, "Fleet statistics viewed", "", False)
+    general_methods.hidden_input("\nPress Enter to return to the scooter menu...")
+
+
+def show_charging_jobs(current_user):
+    require_authorization(current_user, 'charging_jobs')
+    general_methods.clear_console()
+    print("----------------------------------------------------------------------------")
+    print("|" + "Charging Jobs".center(75) + "|")
+    print("----------------------------------------------------------------------------")
+
+    scheduler = get_charging_scheduler()
+    print(f"Scooters below their target SOC range: {len(scheduler)}")
+    if not len(scheduler):
+        general_methods.hidden_input("\nPress Enter to return to the menu...")
+        return
+
+    count = input("How many jobs do you want to take? ").strip()
+    if not count.isdigit() or not (1 <= int(count) <= 100):
+        print("Please enter a number between 1 and 100.")
+        log_instance.log_invalid_input(current_user.username, "charging jobs", f"Invalid job count: {count}")
+        general_methods.hidden_input("\nPress Enter to return to the menu...")
+        return
+
+    print()
+    for scooter_id, deficit, capacity in take_charging_jobs(int(count)):
+        scooter = get_scooter_by_id(scooter_id, fields=['brand', 'model', 'serial_number', 'location_latitude', 'location_longitude'])
+        if scooter is None:
+            continue
+        print(f"ID: {scooter.id} | {scooter.brand} {scooter.model} | Serial: {scooter.serial_number} | "
+              f"SOC deficit: {deficit:.0f}% | Battery: {capacity:.0f} | Location: ({scooter.location_latitude}, {scooter.location_longitude})")
+
+    log_instance.addlog(current_user.username, "Charging jobs taken", f"Count: {count}", False)
+    general_methods.hidden_input("\nPress Enter to return to the menu...")
+
+
+def _print_maintenance_row(entry, scheduler):
+    due, scooter_id = entry
+    scooter = get_scooter_by_id(scooter_id, fields=['brand', 'model', 'serial_number', 'mileage'])
+    if scooter is not None:
+        print(f"Due: {due.isoformat()} | ID: {scooter.id} | {scooter.brand} {scooter.model} | "
+              f"Serial: {scooter.serial_number} | Mileage: {scooter.mileage}")
+        reason = scheduler.flag_reason(scooter_id)
+        if reason:
+            print(f"     Flagged: {reason}")
+
+
+def show_maintenance_due(current_user):
+    require_authorization(current_user, 'maintenance_due')
+    general_methods.clear_console()
+    print("----------------------------------------------------------------------------")
+    print("|" + "Maintenance Planning".center(75) + "|")
+    print("----------------------------------------------------------------------------")
+
+    scheduler = get_maintenance_scheduler()
+    overdue = scheduler.overdue()
+    upcoming = scheduler.due_within(7)
+
+    print(f"\n--- Overdue ({len(overdue)}) ---")
+    general_methods.paginate(overdue, lambda entry: _print_maintenance_row(entry, scheduler))
+
+    print(f"\n--- Due in the next 7 days ({len(upcoming)}) ---")
+    general_methods.paginate(upcoming, lambda entry: _print_maintenance_row(entry, scheduler))
+
+    log_instance.addlog(current_user.username, "Maintenance planning viewed", f"Overdue: {len(overdue)}, upcoming: {len(upcoming)}", False)
+    general_methods.hidden_input("\nPress Enter to return to the scooter menu...")
+
+
+def show_service_route(current_user):
+    require_authorization(current_user, 'plan_service_route')
+    general_methods.clear_console()
+    print("----------------------------------------------------------------------------")
+    print("|" + "Service Route".center(75) + "|")
+    print("----------------------------------------------------------------------------")
+
+    # Only the flagged scooters need their coordinates decrypted
+    stops = []
+    labels = {}
+    for scooter_id in get_fleet_snapshot().flagged_ids():
+        scooter = get_scooter_by_id(scooter_id, fields=['serial_number', 'location_latitude', 'location_longitude'])
+        if scooter is None:
+            continue
+        stops.append((scooter.id, scooter.location_latitude, scooter.location_longitude))
+        labels[scooter.id] = scooter
+
+    if not stops:
+        print("No out-of-service or low-SOC scooters to visit.")
+        general_methods.hidden_input("\nPress Enter to return to the menu...")
+        return
+
+    route = plan_route(stops)
+    print(f"Route along {len(route)} scooters, starting at Rotterdam Centraal:\n")
+
+    def render(step):
+        position, (scooter_id, leg, cumulative) = step
+        scooter = labels[scooter_id]
+        print(f"{position:>3}. Serial: {scooter.serial_number} | Location: ({scooter.location_latitude}, {scooter.location_longitude}) "
+              f"| Leg: {leg:.2f} km | Total: {cumulative:.2f} km")
+
+    general_methods.paginate(enumerate(route, start=1), render)
+    log_instance.addlog(current_user.username, "Service route planned", f"Stops: {len(route)}, distance: {route[-1][2]:.2f} km", False)
+    general_methods.hidden_input("\nPress Enter to return to the menu...")
+
+
+def show_rebalancing(current_user):
+    require_authorization(current_user, 'rebalancing')
+    general_methods.clear_console()
+    print("----------------------------------------------------------------------------")
+    print("|" + "Rebalancing Hotspots".center(75) + "|")
+    print("----------------------------------------------------------------------------")
+
+    report = rebalancing_report()
+    if not report['available']:
+        print("No scooters in service within the service area.")
+        general_methods.hidden_input("\nPress Enter to return to the scooter menu...")
+        return
+
+    print(f"Scooters in service: {report['available']} over {report['cells']} zones "
+          f"(average {report['average']:.2f} per zone)")
+
+    def render(cell):
+        (latitude, longitude), count, imbalance = cell
+        print(f"  Zone ({latitude:.5f}, {longitude:.5f}) | Scooters: {count:>5} | Move: {imbalance:>5}")
+
+    print("\nOver-supplied zones (scooters to move away):")
+    if not general_methods.paginate(report['over_supplied'], render):
+        print("  None")
+
+    print("\nUnder-supplied zones (scooters to bring in):")
+    if not general_methods.paginate(report['under_supplied'], render):
+        print("  None")
+
+    log_instance.addlog(current_user.username, "Rebalancing report viewed",
+                        f"Over: {len(report['over_supplied'])}, under: {len(report['under_supplied'])}", False)
+    general_methods.hidden_input("\nPress Enter to return to the scooter menu...")
+
+
+def show_outside_service_area(current_user):
+    require_authorization(current_user, 'geofence_report')
+    general_methods.clear_console()
+    print("----------------------------------------------------------------------------")
+    print("|" + "Scooters Outside Service Area".center(75) + "|")
+    print("----------------------------------------------------------------------------")
+
+    # One vectorized geofence pass over the snapshot coordinates; only hits are decrypted
+    snapshot = get_fleet_snapshot()
+    ids = snapshot.ids[snapshot.active]
+    outside = get_geofences().outside_service_area(snapshot.column('location_latitude'),
+                                                   snapshot.column('location_longitude'))
+    outside_ids = ids[outside].tolist()
+
+    def render(scooter_id):
+        scooter = get_scooter_by_id(scooter_id, fields=['brand', 'model', 'serial_number', 'location_latitude', 'location_longitude'])
+        if scooter:
+            print(f"ID: {scooter.id} | {scooter.brand} {scooter.model} | Serial: {scooter.serial_number} "
+                  f"| Location: ({scooter.location_latitude}, {scooter.location_longitude})")
+
+    if not general_methods.paginate(outside_ids, render):
+        print("All scooters are within the service area.")
+
+    log_instance.addlog(current_user.username, "Service area report viewed", f"Outside: {len(outside_ids)}", False)
+    general_methods.hidden_input("\nPress Enter to return to the scooter menu...")
+
+
+HISTORY_DAYS_DEFAULT = 7
+
+
+def show_scooter_history(current_user):
+    require_authorization(current_user, 'scooter_history')
+    general_methods.clear_console()
+    print("----------------------------------------------------------------------------")
+    print("|" + "Scooter History".center(75) + "|")
+    print("----------------------------------------------------------------------------")
+
+    try:
+        scooter_id = int(input("Enter the ID of the scooter: ").strip())
+        days = input(f"Number of days to show [{HISTORY_DAYS_DEFAULT}]: ").strip()
+        days = int(days) if days else HISTORY_DAYS_DEFAULT
+    except ValueError:
+        print("Invalid number.")
+        general_methods.hidden_input("\nPress Enter to return to the scooter menu...")
+        return
+    if not 1 <= days <= 3650:
+        print("Number of days must be between 1 and 3650.")
+        general_methods.hidden_input("\nPress Enter to return to the scooter menu...")
+        return
+
+    start = datetime.now() - timedelta(days=days)
+    points = get_scooter_history(scooter_id, start=start)
+
+    def render(point):
+        soc = f"{point.soc}%" if point.bucket_seconds == 0 else f"{point.soc}% ({point.soc_min}-{point.soc_max}%)"
+        print(f"{point.recorded_at:%Y-%m-%d %H:%M} | SOC: {soc:<16} | Mileage: {point.mileage:>7} km "
+              f"| Location: ({point.location_latitude}, {point.location_longitude})")
+
+    if not general_methods.paginate(points, render):
+        print("No history recorded for this scooter in that period.")
+
+    log_instance.addlog(current_user.username, "Scooter history viewed", f"ID: {scooter_id}, days: {days}", False)
+    general_methods.hidden_input("\nPress Enter to return to the scooter menu...")
+
+
+def show_battery_health(current_user):
+    require_authorization(current_user, 'battery_health')
+    general_methods.clear_console()
+    print("----------------------------------------------------------------------------")
+    print("|" + "Battery Health".center(75) + "|")
+    print("----------------------------------------------------------------------------")
+
+    estimates = estimate_battery_health()
+    if not estimates:
+        print(f"Not enough SOC and mileage history in the last {WINDOW_DAYS} days to estimate battery health.")
+        general_methods.hidden_input("\nPress Enter to return to the scooter menu...")
+        return
+
+    degraded = flag_degraded_batteries(estimates)
+    print(f"Scooters assessed: {len(estimates)} | Below {HEALTH_THRESHOLD * 100:.0f}% of fleet median: {len(degraded)}")
+    if degraded:
+        print("These scooters have been flagged in the maintenance planning.\n")
+
+    def render(estimate):
+        scooter = get_scooter_by_id(estimate.scooter_id, fields=['serial_number', 'battery_capacity'])
+        if scooter:
+            print(f"ID: {scooter.id} | Serial: {scooter.serial_number} | Health: {estimate.health * 100:.0f}% "
+                  f"| Capacity: {scooter.battery_capacity} (est. {estimate.estimated_capacity:.0f}) "
+                  f"| Segments: {estimate.segments}")
+
+    general_methods.paginate(sorted(degraded, key=lambda estimate: estimate.health), render)
+
+    log_instance.addlog(current_user.username, "Battery health check", f"Assessed: {len(estimates)}, flagged: {len(degraded)}", False)
+    general_methods.hidden_input("\nPress Enter to return to the scooter menu...")
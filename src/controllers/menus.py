@@ -2,6 +2,7 @@ import sys
 from controllers.user_controller import user_menu, change_own_password, view_profile, show_all_users
 from controllers.traveller_controller import traveller_menu
 from controllers.scooter_controller import scooter_menu
+from controllers.fleet_controller import show_charging_jobs, show_service_route
 from logs.log import LogFunction
 from controllers.rolecheck import is_authorized, require_authorization
 from security.backup import BackupManager
@@ -17,7 +18,9 @@ def service_engineer_menu(user_data):
     print("[1] Change Password")
     print("[2] View Profile")
     print("[3] Manage Scooters")
-    print("[4] Logout")
+    print("[4] Charging Jobs")
+    print("[5] Plan Service Route")
+    print("[6] Logout")
     print("[0] Exit")
     print("----------------------------------------------------------------------------")
 
@@ -39,6 +42,10 @@ def service_engineer_menu(user_data):
             print("You are not authorized to perform this action.")
             time.sleep(0.5)
     elif choice == '4':
+        show_charging_jobs(user_data)
+    elif choice == '5':
+        show_service_route(user_data)
+    elif choice == '6':
         print("Logging out...")
         time.sleep(0.5)
         return False
@@ -56,7 +63,7 @@ def system_administrator_menu(user_data):
     logger = LogFunction()
 
     if logger.check_for_suspicious_logs(user_data):
-        require_authorization(user_data.role, 'view_logs')
+        require_authorization(user_data, 'view_logs')
         logger.show_suspicious_logs(user_data)
 
     general_methods.clear_console()
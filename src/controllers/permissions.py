@@ -0,0 +1,96 @@
+"""
+Role permission matrix.
+Every action is declared once in ACTIONS and gets its own bit. Each role lists the actions
+it adds on top of the role it inherits from (and any it withholds), and the table is
+compiled at import into one integer mask per role, so a check is a single bit test.
+Unknown actions or roles in the table raise at import instead of silently denying access.
+"""
+
+ACTIONS = (
+    # scooters
+    "show_scooter", "search_scooter", "update_scooter", "add_scooter", "delete_scooter",
+    # fleet management
+    "charging_jobs", "maintenance_due", "plan_service_route", "geofence_report", "battery_health",
+    "fleet_stats", "rebalancing", "scooter_history",
+    # travellers
+    "show_traveller", "search_traveller", "list_travellers", "add_traveller", "update_traveller", "delete_traveller",
+    # users
+    "update_own_password", "add_new_user", "update_user", "reset_password", "delete_user", "view_users",
+    # system management
+    "view_logs", "create_backup", "restore_backup", "system_administrator_restore_backup", "check_for_restore_code",
+    "generate_restore_code", "revoke_restore_code", "link_backup_restore_code", "super_admin_restore_backup",
+)
+
+# role: (inherits from, extra actions, inherited actions withheld)
+ROLE_GRANTS = {
+    "service_engineer": (None, {
+        "show_scooter", "search_scooter", "update_scooter", "update_own_password",
+        "charging_jobs", "maintenance_due", "plan_service_route", "geofence_report", "battery_health",
+    }, set()),
+    "system_administrator": ("service_engineer", {
+        "add_scooter", "delete_scooter",
+        "show_traveller", "search_traveller", "list_travellers", "add_traveller", "update_traveller", "delete_traveller",
+        "add_new_user", "update_user", "reset_password", "delete_user", "view_users",
+        "view_logs", "create_backup", "restore_backup", "system_administrator_restore_backup", "check_for_restore_code",
+        "fleet_stats", "rebalancing", "scooter_history",
+    }, set()),
+    "super_administrator": ("system_administrator", {
+        "generate_restore_code", "revoke_restore_code", "link_backup_restore_code", "super_admin_restore_backup",
+    }, {
+        # the super admin account is hardcoded and restores backups without a restore code
+        "update_own_password", "system_administrator_restore_backup", "check_for_restore_code",
+    }),
+}
+
+ACTION_BITS = {action: 1 << bit for bit, action in enumerate(ACTIONS)}
+
+
+def _mask(actions, role):
+    unknown = set(actions) - ACTION_BITS.keys()
+    if unknown:
+        raise ValueError(f"Unknown action(s) for role {role}: {', '.join(sorted(unknown))}")
+    mask = 0
+    for action in actions:
+        mask |= ACTION_BITS[action]
+    return mask
+
+
+def _compile(grants):
+    """One permission mask per role, with the masks of parent roles folded in."""
+    masks = {}
+
+    def compile_role(role, seen=()):
+        if role in masks:
+            return masks[role]
+        if role not in grants:
+            raise ValueError(f"Unknown role: {role}")
+        if role in seen:
+            raise ValueError(f"Role inheritance cycle at {role}")
+        parent, granted, withheld = grants[role]
+        inherited = compile_role(parent, seen + (role,)) if parent else 0
+        masks[role] = (inherited | _mask(granted, role)) & ~_mask(withheld, role)
+        return masks[role]
+
+    for role in grants:
+        compile_role(role)
+    return masks
+
+
+ROLE_MASKS = _compile(ROLE_GRANTS)
+
+
+def has_permission(role: str, action: str) -> bool:
+    """Check if the role may perform the action; an undeclared action raises ValueError."""
+    bit = ACTION_BITS.get(action)
+    if bit is None:
+        raise ValueError(f"Unknown action: {action}")
+    mask = ROLE_MASKS.get(role)
+    if mask is None:
+        mask = ROLE_MASKS.get(role.strip().lower(), 0)
+    return bool(mask & bit)
+
+
+def actions_for(role: str):
+    """Actions the role may perform, in declaration order."""
+    mask = ROLE_MASKS.get(role.strip().lower(), 0)
+    return [action for action in ACTIONS if mask & ACTION_BITS[action]]
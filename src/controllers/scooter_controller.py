@@ -1,10 +1,16 @@
 import sys
-from models.scooter import create_scooter, list_scooters , get_scooter_by_serial_number, delete_scooter, update_scooter, search_scooters_partial
+from models.scooter import create_scooter, iter_scooters, get_scooter_by_id, delete_scooter, update_scooter, search_scooters_partial
+from models.serial_filter import find_scooter_by_serial_number
+from models.db import VersionConflictError
 from security.validation import Validation
 from logs.log import log_instance
 from controllers.rolecheck import is_authorized, require_authorization
 from security.encryption import load_symmetric_key
 from helpers.general_methods import general_methods
+from controllers.fleet_controller import show_fleet_stats, show_maintenance_due, show_service_route, show_rebalancing, \
+    show_outside_service_area, show_scooter_history, show_battery_health
+
+SEARCH_RESULT_LIMIT = 100
 
 def scooter_menu(current_user):
    while True:
@@ -42,6 +48,41 @@ def scooter_menu(current_user):
             options[str(number)] = update_scooter_controller
             number += 1
 
+        if is_authorized(current_user.role, 'fleet_stats'):
+            print(f"{number}. View fleet statistics")
+            options[str(number)] = show_fleet_stats
+            number += 1
+
+        if is_authorized(current_user.role, 'maintenance_due'):
+            print(f"{number}. View maintenance planning")
+            options[str(number)] = show_maintenance_due
+            number += 1
+
+        if is_authorized(current_user.role, 'plan_service_route'):
+            print(f"{number}. Plan service route")
+            options[str(number)] = show_service_route
+            number += 1
+
+        if is_authorized(current_user.role, 'rebalancing'):
+            print(f"{number}. View rebalancing hotspots")
+            options[str(number)] = show_rebalancing
+            number += 1
+
+        if is_authorized(current_user.role, 'geofence_report'):
+            print(f"{number}. View scooters outside service area")
+            options[str(number)] = show_outside_service_area
+            number += 1
+
+        if is_authorized(current_user.role, 'scooter_history'):
+            print(f"{number}. View scooter history")
+            options[str(number)] = show_scooter_history
+            number += 1
+
+        if is_authorized(current_user.role, 'battery_health'):
+            print(f"{number}. Check battery health")
+            options[str(number)] = show_battery_health
+            number += 1
+
         print(f"{number}. Return to previous menu")
         return_option = str(number)
 
@@ -75,7 +116,7 @@ def add_scooter(current_user):
         serial_number = input("Serial Number (10–17 alphanumeric): ").strip()
         if not Validation.serial_number_validation(serial_number, username):
             continue
-        if get_scooter_by_serial_number(serial_number):
+        if find_scooter_by_serial_number(serial_number):
             print("Serial number already exists. Please try again.")
             log_instance.log_invalid_input(username, "serial_number", "Attempt to create duplicate serial number")
             continue
@@ -103,6 +144,16 @@ def add_scooter(current_user):
         username
     )
 
+    # Speed zones cap the top speed of scooters placed inside them
+    if not Validation.speed_cap_validation(top_speed, location_latitude, location_longitude, username):
+        top_speed = Validation.get_valid_input(
+            "Top Speed for this speed zone: ",
+            lambda value, user: (Validation.top_speed_validation(value, user)
+                                 and Validation.speed_cap_validation(value, location_latitude, location_longitude, user)),
+            username,
+            "top speed"
+        )
+
     # TODO: controleer voor inputvalidation boolean
     out_of_service = Validation.get_valid_input(
         "Out of Service? (yes/no): ",
@@ -126,7 +177,7 @@ def add_scooter(current_user):
             soc_range_max=int(soc_range_max),
             location_latitude=float(location_latitude),
             location_longitude=float(location_longitude),
-            out_of_service=out_of_service,
+            out_of_service=out_of_service.lower() == 'yes',
             mileage=int(mileage),
             last_maintenance_date=last_maintenance_date
         )
@@ -149,13 +200,11 @@ def show_scooters(current_user):
     print("|" + "Scooter List".center(75) + "|")
     print("----------------------------------------------------------------------------")
 
-    scooters = list_scooters()
-    if scooters:
-        for s in scooters:
-            lat = float(s.location_latitude)
-            lon = float(s.location_longitude)
-            print(f"{s.brand} {s.model} - Serial: {s.serial_number}, Location: ({s.location_latitude}, {s.location_longitude})")
-    else:
+    shown = general_methods.paginate(
+        iter_scooters(fields=['brand', 'model', 'serial_number', 'location_latitude', 'location_longitude']),
+        lambda s: print(f"{s.brand} {s.model} - Serial: {s.serial_number}, Location: ({s.location_latitude}, {s.location_longitude})")
+    )
+    if not shown:
         print("No scooters found.")
 
     general_methods.hidden_input("\nPress Enter to return to the scooter menu...")
@@ -177,7 +226,7 @@ def deleting_scooter(current_user):
         "serial_number"
     )
 
-    scooter = get_scooter_by_serial_number(serial_number)
+    scooter = find_scooter_by_serial_number(serial_number)
     
     if scooter:
         confirmation = input(f"Are you sure you want to delete scooter {scooter.serial_number}? (yes/no): ").strip().lower()
@@ -201,15 +250,15 @@ def update_scooter_controller(current_user):
     print("----------------------------------------------------------------------------")
 
     # Show scooters
-    scooters = list_scooters()
-    if not scooters:
+    shown = general_methods.paginate(
+        iter_scooters(fields=['brand', 'model', 'serial_number']),
+        lambda s: print(f"ID: {s.id} | Brand: {s.brand} | Model: {s.model} | Serial: {s.serial_number}")
+    )
+    if not shown:
         print("No scooters available to update.")
         general_methods.hidden_input("\nPress Enter to return to the scooter menu...")
         return
 
-    for s in scooters:
-        print(f"ID: {s.id} | Brand: {s.brand} | Model: {s.model} | Serial: {s.serial_number}")
-
     try:
         scooter_id = int(input("\nEnter the ID of the scooter to update: ").strip())
     except ValueError:
@@ -217,7 +266,7 @@ def update_scooter_controller(current_user):
         return
 
     # Search the scooter
-    target_scooter = next((s for s in scooters if s.id == scooter_id), None)
+    target_scooter = get_scooter_by_id(scooter_id)
     if not target_scooter:
         print("Scooter not found.")
         return
@@ -288,7 +337,7 @@ def update_scooter_controller(current_user):
                 continue
             
             # Check if serial number is already in use by another scooter
-            existing_scooter = get_scooter_by_serial_number(new_value)
+            existing_scooter = find_scooter_by_serial_number(new_value)
             if existing_scooter and existing_scooter.id != target_scooter.id:
                 serial_attempts += 1
                 print("Serial number already exists. Please try again.")
@@ -311,12 +360,12 @@ def update_scooter_controller(current_user):
             print("SOC range must be between 0 and 100.")
             return
         if choice == '6':  # Min
-            soc_max = int(target_scooter.soc_range_max)
+            soc_max = target_scooter.soc_range_max
             if int(new_value) >= soc_max:
                 print(f"SOC Range Min must be less than SOC Range Max ({soc_max}).")
                 return
         elif choice == '7':  # Max
-            soc_min = int(target_scooter.soc_range_min)
+            soc_min = target_scooter.soc_range_min
             if int(new_value) <= soc_min:
                 print(f"SOC Range Max must be greater than SOC Range Min ({soc_min}).")
                 return
@@ -334,6 +383,14 @@ def update_scooter_controller(current_user):
         log_instance.log_invalid_input(username, field_key, f"Update validation failed")
         return
 
+    # Speed zone caps, for both a new top speed and a move into a capped zone
+    if choice in ['3', '8', '9']:
+        top_speed = new_value if choice == '3' else target_scooter.top_speed
+        latitude = new_value if choice == '8' else target_scooter.location_latitude
+        longitude = new_value if choice == '9' else target_scooter.location_longitude
+        if not Validation.speed_cap_validation(top_speed, latitude, longitude, username):
+            return
+
     # Convert
     if field_key == 'out_of_service':
         new_value = new_value.lower() == 'yes'
@@ -342,8 +399,16 @@ def update_scooter_controller(current_user):
     elif field_key in ['location_latitude', 'location_longitude']:
         new_value = float(new_value)
 
-    # Update the scooter
-    if update_scooter(scooter_id, {field_key: new_value}):
+    # Update the scooter, unless someone else changed it while the new value was entered
+    try:
+        updated = update_scooter(scooter_id, {field_key: new_value}, expected_version=target_scooter.version)
+    except VersionConflictError:
+        print("This scooter was changed or deleted by another user in the meantime. Please try again.")
+        log_instance.addlog(username, f"Scooter {field_key} update conflict", f"ID: {scooter_id}", False)
+        general_methods.hidden_input("\nPress Enter to return to the scooter menu...")
+        return
+
+    if updated:
         print("Scooter updated successfully.")
         log_instance.addlog(username, f"Scooter {field_key} updated", f"ID: {scooter_id}", False)
     else:
@@ -366,13 +431,15 @@ def search_scooter(current_user):
         field_name="search scooter"
     )
     
-    result = search_scooters_partial(query)
+    result = search_scooters_partial(query, limit=SEARCH_RESULT_LIMIT)
 
     if result:
         print("\n--- Search Results ---")
         for scooter in result:
             print(f"Brand: {scooter.brand}, Model: {scooter.model}, Serial Number: {scooter.serial_number}")
-            log_instance.addlog(current_user.username, "Scooter search", query, False)
+        if len(result) == SEARCH_RESULT_LIMIT:
+            print(f"\nShowing the first {SEARCH_RESULT_LIMIT} matches; refine your search to see others.")
+        log_instance.addlog(current_user.username, "Scooter search", query, False)
     else:
         print("No matching scooters found.")
         log_instance.addlog(current_user.username, "Scooter search - no results", query, False)
@@ -1,11 +1,14 @@
 from security.validation import Validation
-from models.traveller import create_traveller, list_travellers, find_travellers, update_traveller, delete_traveller
+from models.traveller import create_traveller, iter_travellers, find_travellers, get_traveller_by_id, update_traveller, delete_traveller
+from models.db import VersionConflictError
 from logs.log import log_instance
 from controllers.rolecheck import require_authorization
 from helpers.general_methods import general_methods
 
 import sys
 
+SEARCH_RESULT_LIMIT = 100
+
 def traveller_menu(current_user):
     while True:
         general_methods.clear_console()
@@ -59,11 +62,11 @@ def show_travellers(current_user):
     print("|" + f"Traveller list".center(75) + "|")
     print("----------------------------------------------------------------------------")
 
-    travellers = list_travellers(current_user)
-    if travellers:
-        for t in travellers:
-            print(f"ID: {t.id} | Name: {t.first_name} {t.last_name} | Email: {t.email}")
-    else:
+    shown = general_methods.paginate(
+        iter_travellers(current_user, fields=['first_name', 'last_name', 'email']),
+        lambda t: print(f"ID: {t.id} | Name: {t.first_name} {t.last_name} | Email: {t.email}")
+    )
+    if not shown:
         print("No travellers found.")
 
     general_methods.hidden_input("\nPress Enter to return to the traveller menu...")
@@ -125,12 +128,14 @@ def search_traveller(current_user):
         username = current_user.username,
         field_name = "search traveller"
     )
-    result = find_travellers(query)
+    result = find_travellers(query, limit=SEARCH_RESULT_LIMIT)
 
     if result:
         print("\n--- Search Results ---")
         for r in result:
             print(f"{r['first_name']} {r['last_name']} | ID: {r['id']} | Email: {r['email']}")
+        if len(result) == SEARCH_RESULT_LIMIT:
+            print(f"\nShowing the first {SEARCH_RESULT_LIMIT} matches; refine your search to see others.")
         log_instance.addlog(current_user.username, "Traveller search", query, False)
     else:
         print("No matching travellers found.")
@@ -152,6 +157,12 @@ def update_traveller_controller(current_user):
         log_instance.log_invalid_input(current_user.username, "traveller_id", "Invalid ID format", True)
         return
 
+    # The version read here is checked again when the change is written
+    target_traveller = get_traveller_by_id(customer_id, fields=['version'])
+    if not target_traveller:
+        print("Traveller not found.")
+        return
+
     print("\nWhich field do you want to update?")
     print("1. First Name")
     print("2. Last Name")
@@ -201,7 +212,14 @@ def update_traveller_controller(current_user):
         field_name=field_key
     )
 
-    if update_traveller(customer_id, {field_key: new_value}):
+    try:
+        updated = update_traveller(customer_id, {field_key: new_value}, expected_version=target_traveller.version)
+    except VersionConflictError:
+        print("This traveller was changed or deleted by another user in the meantime. Please try again.")
+        log_instance.addlog(username, f"{field_key} update conflict", f"Traveller ID {customer_id}", False)
+        return
+
+    if updated:
         print("Traveller updated successfully.")
         log_instance.addlog(username, f"{field_key} updated", f"Traveller ID {customer_id}", False)
     else:
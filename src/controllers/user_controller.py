@@ -1,11 +1,14 @@
+import csv
 import sys
 from security.validation import Validation
-from models.user import get_user_by_username, create_user, update_password, list_users, User, delete_user_by_id, update_user_by_id, update_password_by_id, clear_temporary_passwords, get_user_password_by_username
+from models.user import get_user_by_username, create_user, create_users_bulk, update_password, list_users, list_users_by_role, User, delete_user_by_id, update_user_by_id, update_password_by_id, reset_passwords_bulk, clear_temporary_passwords, get_user_password_by_username
 from logs.log import log_instance
 from controllers.rolecheck import is_authorized
 from security.password_hashing import validate_password
 from controllers.rolecheck import require_authorization
 from helpers.general_methods import general_methods
+from models.db import VersionConflictError
+from security.credentials import generate_temporary_password, write_credentials_file, read_credentials_file, list_credentials_files, delete_credentials_file
 
 def user_menu(user_data: User):
     if not isinstance(user_data, User):
@@ -65,6 +68,27 @@ def user_menu(user_data: User):
         else:
             reset_pw_option = None
 
+        if is_authorized(user_data.role, "add_new_user"):
+            print(f"{number}. Bulk create users from file")
+            bulk_create_option = str(number)
+            number += 1
+        else:
+            bulk_create_option = None
+
+        if is_authorized(user_data.role, "reset_password"):
+            print(f"{number}. Bulk reset passwords from file")
+            bulk_reset_option = str(number)
+            number += 1
+        else:
+            bulk_reset_option = None
+
+        if bulk_create_option or bulk_reset_option:
+            print(f"{number}. View credentials file")
+            credentials_option = str(number)
+            number += 1
+        else:
+            credentials_option = None
+
         print(f"{number}. Exit user system, go back")
         exit_option = str(number)
 
@@ -94,6 +118,15 @@ def user_menu(user_data: User):
         elif choice == reset_pw_option:
             reset_user_password(user_data)
 
+        elif choice == bulk_create_option:
+            bulk_create_users(user_data)
+
+        elif choice == bulk_reset_option:
+            bulk_reset_passwords(user_data)
+
+        elif choice == credentials_option:
+            view_credentials_file(user_data)
+
         elif choice == exit_option:
             print("Exiting the system. Goodbye!")
             return
@@ -191,11 +224,11 @@ def show_all_users(current_user):
     print("|" + "Creating a new user".center(75) + "|")
     print("----------------------------------------------------------------------------")
 
-    users = list_users()
-    if users:
-        for user in users:
-            print(f"Username: {user.username} | Firstname: {user.firstname} | Lastname: {user.lastname} | Role: {user.role} | Created on: {user.registration_date}")
-    else:
+    shown = general_methods.paginate(
+        list_users(),
+        lambda user: print(f"Username: {user.username} | Firstname: {user.firstname} | Lastname: {user.lastname} | Role: {user.role} | Created on: {user.registration_date}")
+    )
+    if not shown:
         print("No users found.")
     
     general_methods.hidden_input("\nPress Enter to return to the user menu...")
@@ -213,26 +246,12 @@ def get_permitted_roles(user_role):
     return role_permissions.get(user_role, {})
 
 def get_deletable_users(current_user):
-    all_users = list_users()
-    deletable = []
-
-    for user in all_users:
-        if user.username == current_user.username:
-            continue  # users can not delete themselves
-
-        if user.role == "super_administrator":
-            continue  # super_admin may not be deleted
-
-        if user.role == "system_administrator" and current_user.role == "super_administrator":
-            deletable.append(user)
-
-        elif user.role == "service_engineer" and current_user.role in ["system_administrator", "super_administrator"]:
-            deletable.append(user)
-
-        if user.role == "1":
-            deletable.append(user)
-
-    return deletable
+    # super_admin may not be deleted; "1" is the legacy code of a service engineer
+    roles = list(get_permitted_roles(current_user.role)) + ["1"]
+    return [
+        user for user in list_users_by_role(roles, fields=['username', 'role'])
+        if user.username != current_user.username  # users can not delete themselves
+    ]
 
 def delete_user_account(current_user):
     require_authorization(current_user, 'delete_user')
@@ -285,25 +304,12 @@ def delete_user_account(current_user):
     general_methods.hidden_input("\nPress Enter to return to the user menu...")
 
 def get_editable_users(current_user):
-    all_users = list_users()
-    editable = []
-
-    for user in all_users:
-        if user.username == current_user.username:
-            continue  # users can not edit themselves
-
-        if user.role == "super_administrator":
-            continue  # super_admin may not be edited
-
-        if user.role == "system_administrator":
-            if current_user.role == "super_administrator":
-                editable.append(user)
-
-        elif user.role == "service_engineer":
-            if current_user.role in ["super_administrator", "system_administrator"]:
-                editable.append(user)
-
-    return editable
+    # super_admin may not be edited
+    roles = list(get_permitted_roles(current_user.role))
+    return [
+        user for user in list_users_by_role(roles, fields=['username', 'firstname', 'lastname', 'role', 'version'])
+        if user.username != current_user.username  # users can not edit themselves
+    ]
 
 def update_user_account(current_user):
     require_authorization(current_user, 'update_user')
@@ -371,7 +377,14 @@ def update_user_account(current_user):
         print("Invalid choice.")
         return
 
-    success = update_user_by_id(target_id, update_data)
+    try:
+        success = update_user_by_id(target_id, update_data, expected_version=target_user.version)
+    except VersionConflictError:
+        print("This user was changed or deleted by someone else in the meantime. Please try again.")
+        log_instance.addlog(current_user.username, "User update conflict", str(update_data), False)
+        general_methods.hidden_input("\nPress Enter to return to the user menu...")
+        return
+
     if success:
         print("User updated successfully.")
         log_instance.addlog(current_user.username, "User updated", str(update_data), False)
@@ -466,3 +479,203 @@ def reset_user_password(current_user):
     else:
         print("Password reset failed.")
         log_instance.addlog(current_user.username, "Password reset failed", f"Target: {target_user.username}", False)
+
+
+BULK_CREATE_COLUMNS = ('username', 'firstname', 'lastname', 'role')
+
+def _read_bulk_file(current_user, required_columns):
+    """Ask for a CSV file and return its rows as (line number, dict) tuples, or None."""
+    path = input(f"Enter the path of the CSV file (columns: {', '.join(required_columns)}): ").strip()
+    try:
+        with open(path, newline='') as f:
+            reader = csv.DictReader(f)
+            missing = set(required_columns) - set(reader.fieldnames or ())
+            if missing:
+                print(f"The file is missing the column(s): {', '.join(sorted(missing))}")
+                return None
+            rows = [(line, {column: (row[column] or '').strip() for column in required_columns})
+                    for line, row in enumerate(reader, start=2)]
+    except (OSError, csv.Error, UnicodeDecodeError) as e:
+        print(f"Could not read the file: {e}")
+        log_instance.log_invalid_input(current_user.username, "bulk file", "Unreadable bulk user file", False)
+        return None
+
+    if not rows:
+        print("The file contains no users.")
+        return None
+    return rows
+
+def _confirm_bulk(count, action):
+    return input(f"{action} {count} user(s)? (yes/no): ").strip().lower() == "yes"
+
+def bulk_create_users(current_user):
+    require_authorization(current_user, 'add_new_user')
+    general_methods.clear_console()
+    print("----------------------------------------------------------------------------")
+    print("|" + "Bulk create users".center(75) + "|")
+    print("----------------------------------------------------------------------------")
+
+    rows = _read_bulk_file(current_user, BULK_CREATE_COLUMNS)
+    if rows is None:
+        general_methods.hidden_input("\nPress Enter to return to the user menu...")
+        return
+
+    allowed_roles = get_permitted_roles(current_user.role)
+    errors = []
+    seen = set()
+    users = []
+    for line, row in rows:
+        username = row['username'].lower()
+        role = row['role'].lower()
+        if not Validation.username_validation(username):
+            errors.append(f"Line {line}: invalid username '{row['username']}'")
+        elif username in seen or get_user_by_username(username):
+            errors.append(f"Line {line}: username '{username}' already exists")
+        if role not in allowed_roles:
+            errors.append(f"Line {line}: you may not create users with role '{row['role']}'")
+        if not (Validation.name_validation(row['firstname'], current_user.username)
+                and Validation.name_validation(row['lastname'], current_user.username)):
+            errors.append(f"Line {line}: invalid first or last name")
+        seen.add(username)
+        users.append({'username': username, 'firstname': row['firstname'], 'lastname': row['lastname'],
+                      'role': role, 'password': generate_temporary_password()})
+
+    # All or nothing: a file with errors is rejected as a whole
+    if errors:
+        print("\nNo users were created:")
+        for error in errors:
+            print(f"  {error}")
+        log_instance.addlog(current_user.username, "Bulk user creation rejected", f"{len(errors)} invalid row(s)", False)
+        general_methods.hidden_input("\nPress Enter to return to the user menu...")
+        return
+
+    if not _confirm_bulk(len(users), "Create"):
+        print("Cancelled.")
+        return
+
+    # The credentials file is written first: users whose passwords nobody can read are useless
+    try:
+        path = write_credentials_file([(user['username'], user['password']) for user in users], "new_users",
+                                      current_user)
+    except OSError as e:
+        print(f"Could not write the credentials file: {e}")
+        print("No users were created.")
+        log_instance.addlog(current_user.username, "Bulk user creation failed", "Credentials file not written", True)
+        general_methods.hidden_input("\nPress Enter to return to the user menu...")
+        return
+
+    user_ids = create_users_bulk(users)
+    if user_ids is None:
+        delete_credentials_file(path)
+        log_instance.addlog(current_user.username, "Bulk user creation failed", f"{len(users)} user(s)", True)
+        print("Creating the users failed; no users were created.")
+    else:
+        log_instance.addlog(current_user.username, "Bulk user creation", f"{len(user_ids)} user(s) created", False)
+        print(f"{len(user_ids)} user(s) created with temporary passwords.")
+        print(f"The encrypted credentials were written to {path}")
+
+    general_methods.hidden_input("\nPress Enter to return to the user menu...")
+
+def bulk_reset_passwords(current_user):
+    require_authorization(current_user, 'reset_password')
+    general_methods.clear_console()
+    print("----------------------------------------------------------------------------")
+    print("|" + "Bulk reset passwords".center(75) + "|")
+    print("----------------------------------------------------------------------------")
+
+    rows = _read_bulk_file(current_user, ('username',))
+    if rows is None:
+        general_methods.hidden_input("\nPress Enter to return to the user menu...")
+        return
+
+    editable = {user.username.lower(): user for user in get_editable_users(current_user)}
+    errors = []
+    targets = {}
+    for line, row in rows:
+        user = editable.get(row['username'].lower())
+        if user is None:
+            errors.append(f"Line {line}: user '{row['username']}' not found or not editable by your role")
+        else:
+            targets[user.id] = user.username
+
+    if errors:
+        print("\nNo passwords were reset:")
+        for error in errors:
+            print(f"  {error}")
+        log_instance.addlog(current_user.username, "Bulk password reset rejected", f"{len(errors)} invalid row(s)", False)
+        general_methods.hidden_input("\nPress Enter to return to the user menu...")
+        return
+
+    if not _confirm_bulk(len(targets), "Reset the password of"):
+        print("Cancelled.")
+        return
+
+    passwords = {user_id: generate_temporary_password() for user_id in targets}
+    try:
+        path = write_credentials_file([(targets[user_id], password) for user_id, password in passwords.items()],
+                                      "password_reset", current_user)
+    except OSError as e:
+        print(f"Could not write the credentials file: {e}")
+        print("No passwords were changed.")
+        log_instance.addlog(current_user.username, "Bulk password reset failed", "Credentials file not written", True)
+        general_methods.hidden_input("\nPress Enter to return to the user menu...")
+        return
+
+    if reset_passwords_bulk(passwords):
+        log_instance.addlog(current_user.username, "Bulk password reset", f"Targets: {', '.join(targets.values())}", False)
+        print(f"{len(passwords)} password(s) reset to temporary passwords.")
+        print(f"The encrypted credentials were written to {path}")
+    else:
+        delete_credentials_file(path)
+        log_instance.addlog(current_user.username, "Bulk password reset failed", f"{len(targets)} user(s)", True)
+        print("Resetting the passwords failed; no passwords were changed.")
+
+    general_methods.hidden_input("\nPress Enter to return to the user menu...")
+
+def view_credentials_file(current_user):
+    if not (is_authorized(current_user.role, 'add_new_user') or is_authorized(current_user.role, 'reset_password')):
+        print("You are not authorized to perform this action.")
+        return
+    general_methods.clear_console()
+
+    try:
+        files = list_credentials_files(current_user)
+    except OSError as e:
+        print(f"Could not read the credentials files: {e}")
+        general_methods.hidden_input("\nPress Enter to return to the user menu...")
+        return
+    if not files:
+        print("No credentials files found.")
+        general_methods.hidden_input("\nPress Enter to return to the user menu...")
+        return
+
+    for number, name in enumerate(files, start=1):
+        print(f"{number}. {name}")
+    choice = input("\nEnter the number of the file to show: ").strip()
+    if not choice.isdigit() or not 1 <= int(choice) <= len(files):
+        print("Invalid choice.")
+        return
+
+    name = files[int(choice) - 1]
+    try:
+        credentials = read_credentials_file(name, current_user)
+    except (OSError, ValueError) as e:
+        print(f"Could not read the credentials file: {e}")
+        general_methods.hidden_input("\nPress Enter to return to the user menu...")
+        return
+    if credentials is None:
+        print("This credentials file was not created by you.")
+        log_instance.addlog(current_user.username, "Credentials file access denied", name, True)
+        general_methods.hidden_input("\nPress Enter to return to the user menu...")
+        return
+
+    for username, password in credentials:
+        print(f"Username: {username} | Temporary password: {password}")
+    # Shown once: the temporary passwords have to be handed out now
+    try:
+        delete_credentials_file(name)
+    except OSError as e:
+        print(f"Could not delete the credentials file: {e}")
+    log_instance.addlog(current_user.username, "Credentials file viewed", name, False)
+    print("\nThe file has been deleted; note the passwords before leaving this screen.")
+    general_methods.hidden_input("\nPress Enter to return to the user menu...")
@@ -0,0 +1,193 @@
+"""
+Fleet analytics on a columnar snapshot of the numeric scooter fields.
+The snapshot is built once (from the read model when it is loaded, otherwise with a single
+projected pass over the scooters table) and then patched in place from scooter change
+events, so dashboards never have to decrypt the whole table again. It is rebuilt when the
+scooters change counter shows a write that did not come through those events (another
+process, a restore).
+"""
+from array import array
+import numpy as np
+
+from models import events
+from models.db import open_connection, close_connection, read_change_counters
+from models.scooter import iter_scooters
+
+# Numeric columns held by the snapshot; out_of_service is stored as 0.0 / 1.0
+NUMERIC_FIELDS = ('top_speed', 'battery_capacity', 'soc', 'soc_range_min', 'soc_range_max', 'mileage', 'out_of_service',
+                  'location_latitude', 'location_longitude')
+SNAPSHOT_FIELDS = ('brand',) + NUMERIC_FIELDS
+
+SOC_BINS = tuple(range(0, 101, 10))
+BUILD_PAGE_SIZE = 1000
+
+
+def _as_number(field, value):
+    if field == 'out_of_service':
+        return 1.0 if value in (True, 'True', 'yes') else 0.0
+    return float(value)
+
+
+class FleetSnapshot:
+    """Column arrays indexed by row; `active` masks out rows whose scooter was deleted."""
+
+    def __init__(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.columns = {field: np.empty(0, dtype=np.float64) for field in NUMERIC_FIELDS}
+        self.brand_codes = np.empty(0, dtype=np.int64)
+        self.active = np.empty(0, dtype=bool)
+        self.brands = []
+        self._brand_index = {}
+        self._row_of = {}
+
+    @classmethod
+    def build(cls, scooters):
+        """Build a snapshot from scooter objects in one pass, using compact typed arrays."""
+        snapshot = cls()
+        ids = array('q')
+        codes = array('q')
+        values = {field: array('d') for field in NUMERIC_FIELDS}
+        for scooter in scooters:
+            ids.append(scooter.id)
+            codes.append(snapshot._brand_code(scooter.brand))
+            for field in NUMERIC_FIELDS:
+                values[field].append(_as_number(field, getattr(scooter, field)))
+
+        snapshot.ids = np.frombuffer(ids, dtype=np.int64).copy()
+        snapshot.brand_codes = np.frombuffer(codes, dtype=np.int64).copy()
+        snapshot.columns = {field: np.frombuffer(values[field], dtype=np.float64).copy() for field in NUMERIC_FIELDS}
+        snapshot.active = np.ones(len(snapshot.ids), dtype=bool)
+        snapshot._row_of = {int(scooter_id): row for row, scooter_id in enumerate(snapshot.ids)}
+        return snapshot
+
+    def _brand_code(self, brand):
+        if brand not in self._brand_index:
+            self._brand_index[brand] = len(self.brands)
+            self.brands.append(brand)
+        return self._brand_index[brand]
+
+    # --- incremental maintenance ---------------------------------------------------
+
+    def apply_change(self, action, scooter_id, fields):
+        row = self._row_of.get(scooter_id)
+        if action == events.DELETED:
+            if row is not None:
+                self.active[row] = False
+                del self._row_of[scooter_id]
+        elif action == events.CREATED:
+            self._append(scooter_id, fields)
+        elif row is not None:
+            for field, value in fields.items():
+                if field in self.columns:
+                    self.columns[field][row] = _as_number(field, value)
+                elif field == 'brand':
+                    self.brand_codes[row] = self._brand_code(value)
+
+    def _append(self, scooter_id, fields):
+        self._row_of[scooter_id] = len(self.ids)
+        self.ids = np.append(self.ids, scooter_id)
+        self.brand_codes = np.append(self.brand_codes, self._brand_code(fields['brand']))
+        self.active = np.append(self.active, True)
+        for field in NUMERIC_FIELDS:
+            self.columns[field] = np.append(self.columns[field], _as_number(field, fields[field]))
+
+    def rows_of(self, scooter_ids):
+        """Row index of each scooter id, -1 for scooters that are not (or no longer) in the snapshot."""
+        return np.array([self._row_of.get(int(scooter_id), -1) for scooter_id in scooter_ids], dtype=np.int64)
+
+    # --- aggregates ----------------------------------------------------------------
+
+    def column(self, field):
+        """Values of one column for the scooters that still exist."""
+        return self.columns[field][self.active]
+
+    def count(self):
+        return int(self.active.sum())
+
+    def soc_distribution(self, bins=SOC_BINS):
+        """Number of scooters per SOC bucket, as (lower, upper, count) tuples."""
+        counts, edges = np.histogram(self.column('soc'), bins=bins)
+        return [(int(edges[i]), int(edges[i + 1]), int(counts[i])) for i in range(len(counts))]
+
+    def out_of_service_share(self):
+        values = self.column('out_of_service')
+        return float(values.mean()) if len(values) else 0.0
+
+    def average_mileage_per_brand(self):
+        codes = self.brand_codes[self.active]
+        totals = np.bincount(codes, weights=self.column('mileage'), minlength=len(self.brands))
+        counts = np.bincount(codes, minlength=len(self.brands))
+        return {
+            brand: float(totals[code] / counts[code])
+            for code, brand in enumerate(self.brands) if counts[code]
+        }
+
+    def outside_soc_target(self):
+        """Number of scooters below soc_range_min and above soc_range_max."""
+        soc = self.column('soc')
+        below = int((soc < self.column('soc_range_min')).sum())
+        above = int((soc > self.column('soc_range_max')).sum())
+        return below, above
+
+    def flagged_ids(self):
+        """Ids of scooters that are out of service or below their target SOC range."""
+        soc = self.columns['soc']
+        flagged = self.active & ((self.columns['out_of_service'] > 0) | (soc < self.columns['soc_range_min']))
+        return self.ids[flagged].tolist()
+
+    def stats(self):
+        below, above = self.outside_soc_target()
+        return {
+            'count': self.count(),
+            'soc_distribution': self.soc_distribution(),
+            'out_of_service_share': self.out_of_service_share(),
+            'average_mileage_per_brand': self.average_mileage_per_brand(),
+            'below_soc_target': below,
+            'above_soc_target': above,
+        }
+
+
+_snapshot = None
+_snapshot_changes = None  # scooters change counter the snapshot is current with
+
+
+def _read_scooter_changes():
+    conn = open_connection()
+    try:
+        return read_change_counters(conn, ('scooters',))
+    finally:
+        close_connection(conn)
+
+
+def _on_scooter_change(action, scooter_id, fields):
+    global _snapshot_changes
+    if _snapshot is not None:
+        _snapshot.apply_change(action, scooter_id, fields)
+        # The write behind this event bumped the counter too; it must not force a rebuild
+        _snapshot_changes = _read_scooter_changes()
+
+
+def get_fleet_snapshot():
+    """Return the shared snapshot, (re)building it on first use or after an outside change."""
+    global _snapshot, _snapshot_changes
+    changes = _read_scooter_changes()
+    if _snapshot is not None and changes != _snapshot_changes:
+        reset_fleet_snapshot()
+    if _snapshot is None:
+        from models.read_model import read_model
+        if read_model.is_loaded("scooter"):
+            scooters = read_model.all_scooters()
+        else:
+            scooters = iter_scooters(page_size=BUILD_PAGE_SIZE, fields=SNAPSHOT_FIELDS)
+        _snapshot = FleetSnapshot.build(scooters)
+        _snapshot_changes = changes
+        events.subscribe("scooter", _on_scooter_change)
+    return _snapshot
+
+
+def reset_fleet_snapshot():
+    """Forget the snapshot so the next call rebuilds it (e.g. after restoring a backup)."""
+    global _snapshot, _snapshot_changes
+    _snapshot = None
+    _snapshot_changes = None
+    events.unsubscribe("scooter", _on_scooter_change)
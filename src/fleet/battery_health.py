@@ -0,0 +1,102 @@
+"""
+Battery health estimation.
+For every scooter the SOC drop is regressed on the distance driven between consecutive
+history points (a line through the origin, so the slope is % SOC per km). Multiplied by
+battery_capacity this gives the energy used per km; a battery that has lost capacity
+burns through its SOC faster, so its health is the fleet median consumption divided by
+its own. All scooters are fitted at once with np.bincount over the history arrays, and
+the history table is plaintext telemetry, so nothing is decrypted.
+"""
+import sqlite3
+import time
+import numpy as np
+
+from models.db import open_connection, close_connection
+from fleet.analytics import get_fleet_snapshot
+from fleet.maintenance import flag_scooter
+
+WINDOW_DAYS = 30
+# Scooters below this share of the fleet median are flagged for maintenance
+HEALTH_THRESHOLD = 0.8
+# Minimum number of discharge segments before a scooter's estimate is trusted
+MIN_SEGMENTS = 5
+
+
+class BatteryHealth:
+    __slots__ = ('scooter_id', 'segments', 'soc_per_km', 'health', 'estimated_capacity')
+
+    def __init__(self, scooter_id, segments, soc_per_km, health, estimated_capacity):
+        self.scooter_id = scooter_id
+        self.segments = segments
+        self.soc_per_km = soc_per_km
+        self.health = health
+        self.estimated_capacity = estimated_capacity
+
+
+def _load_history(since):
+    """(scooter_id, soc, mileage) arrays of the history rows since `since`, ordered per scooter in time."""
+    conn = open_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            SELECT scooter_id, soc, mileage FROM scooter_history
+            WHERE recorded_at >= ? ORDER BY scooter_id, recorded_at, id
+        ''', (since,))
+        rows = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 3)
+        return rows[:, 0], rows[:, 1].astype(np.float64), rows[:, 2].astype(np.float64)
+    except sqlite3.Error as e:
+        print(f"An error occurred while reading scooter history: {e}")
+        empty = np.empty(0)
+        return empty.astype(np.int64), empty, empty
+    finally:
+        close_connection(conn)
+
+
+def estimate_battery_health(window_days=WINDOW_DAYS, min_segments=MIN_SEGMENTS, snapshot=None, now=None):
+    """Estimate health for every scooter with enough discharge segments in the window."""
+    now = now or int(time.time())
+    ids, soc, mileage = _load_history(now - window_days * 86400)
+    if len(ids) < 2:
+        return []
+
+    # Segments between consecutive points of the same scooter that drove and discharged
+    same = ids[1:] == ids[:-1]
+    distance = mileage[1:] - mileage[:-1]
+    drop = soc[:-1] - soc[1:]
+    usable = same & (distance > 0) & (drop > 0)
+    segment_ids = ids[1:][usable]
+    distance = distance[usable]
+    drop = drop[usable]
+    if not len(segment_ids):
+        return []
+
+    # Least squares through the origin per scooter: slope = sum(x*y) / sum(x*x)
+    scooter_ids, group = np.unique(segment_ids, return_inverse=True)
+    counts = np.bincount(group)
+    xy = np.bincount(group, weights=distance * drop)
+    xx = np.bincount(group, weights=distance * distance)
+    slope = xy / xx
+
+    snapshot = snapshot or get_fleet_snapshot()
+    rows = snapshot.rows_of(scooter_ids)
+    known = (rows >= 0) & (counts >= min_segments)
+    if not known.any():
+        return []
+    capacity = snapshot.columns['battery_capacity'][rows[known]]
+    consumption = slope[known] / 100.0 * capacity
+    health = np.median(consumption) / consumption
+
+    return [
+        BatteryHealth(scooter_id, segments, soc_per_km, scooter_health, scooter_capacity * min(scooter_health, 1.0))
+        for scooter_id, segments, soc_per_km, scooter_health, scooter_capacity in zip(
+            scooter_ids[known].tolist(), counts[known].tolist(), slope[known].tolist(), health.tolist(), capacity.tolist()
+        )
+    ]
+
+
+def flag_degraded_batteries(estimates, threshold=HEALTH_THRESHOLD):
+    """Flag scooters whose battery health is below the threshold in the maintenance planning."""
+    degraded = [estimate for estimate in estimates if estimate.health < threshold]
+    for estimate in degraded:
+        flag_scooter(estimate.scooter_id, f"Battery health {estimate.health * 100:.0f}%")
+    return degraded
@@ -0,0 +1,187 @@
+"""
+Charging scheduler.
+Keeps a heap of scooters whose SOC is below their soc_range_min, ordered by SOC deficit
+(largest first) and then battery capacity (largest first). The heap is seeded by a SQL
+filter on the plaintext telemetry columns (only scooters below their minimum are fetched,
+nothing is decrypted) and kept current from scooter change events; superseded heap entries
+are invalidated lazily, so updates and pops are O(log n). It is reseeded when the scooters
+or charging_jobs change counter shows a write from outside those events.
+Handed-out jobs are recorded in the charging_jobs table and left out of the heap, also on a
+reseed and in other sessions, until the scooter is no longer below its minimum.
+"""
+import heapq
+import numpy as np
+
+from models import events
+from models.db import open_connection, close_connection, read_change_counters, PLAINTEXT_TELEMETRY
+from models.scooter import get_scooter_by_id, filter_scooters, Column
+from models.charging_jobs import load_taken_jobs, take_jobs, release_jobs
+from fleet.analytics import get_fleet_snapshot
+
+_PRIORITY_FIELDS = ('soc', 'soc_range_min', 'battery_capacity')
+
+
+class ChargingScheduler:
+    def __init__(self):
+        self._heap = []
+        self._entries = {}  # scooter id -> its live heap entry
+        self._state = {}    # scooter id -> {'soc', 'soc_range_min', 'battery_capacity'}
+        self._taken = set()  # scooter ids whose job has been handed out
+
+    def _seed(self, jobs):
+        """Heapify (scooter_id, deficit, battery_capacity) jobs, leaving out the handed-out ones."""
+        below_minimum = {scooter_id for scooter_id, _, _ in jobs}
+        taken = load_taken_jobs()
+        # A handed-out job whose scooter was charged meanwhile is done
+        release_jobs(taken - below_minimum)
+        self._taken = taken & below_minimum
+        for scooter_id, deficit, capacity in jobs:
+            if scooter_id not in self._taken:
+                entry = [-deficit, -capacity, scooter_id, True]
+                self._entries[scooter_id] = entry
+                self._heap.append(entry)
+        heapq.heapify(self._heap)
+
+    @classmethod
+    def from_database(cls):
+        """Seed with the scooters below their soc_range_min, selected by SQLite."""
+        scheduler = cls()
+        jobs = []
+        for scooter in filter_scooters([('soc', '<', Column('soc_range_min'))], fields=_PRIORITY_FIELDS):
+            state = {field: float(getattr(scooter, field)) for field in _PRIORITY_FIELDS}
+            scheduler._state[scooter.id] = state
+            jobs.append((scooter.id, state['soc_range_min'] - state['soc'], state['battery_capacity']))
+        scheduler._seed(jobs)
+        return scheduler
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        scheduler = cls()
+        active = snapshot.active
+        ids = snapshot.ids[active]
+        soc = snapshot.columns['soc'][active]
+        soc_min = snapshot.columns['soc_range_min'][active]
+        capacity = snapshot.columns['battery_capacity'][active]
+
+        for scooter_id, soc_value, min_value, capacity_value in zip(ids.tolist(), soc.tolist(), soc_min.tolist(), capacity.tolist()):
+            scheduler._state[scooter_id] = {
+                'soc': soc_value, 'soc_range_min': min_value, 'battery_capacity': capacity_value
+            }
+
+        # Only scooters under their minimum become jobs; heapify is O(n)
+        scheduler._seed([(int(ids[i]), float(soc_min[i] - soc[i]), float(capacity[i]))
+                         for i in np.flatnonzero(soc < soc_min).tolist()])
+        return scheduler
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _invalidate(self, scooter_id):
+        entry = self._entries.pop(scooter_id, None)
+        if entry is not None:
+            entry[3] = False
+
+    def update(self, scooter_id, values):
+        """Apply new soc / soc_range_min / battery_capacity values and requeue if needed."""
+        state = self._state.get(scooter_id)
+        if state is None:
+            scooter = get_scooter_by_id(scooter_id, fields=_PRIORITY_FIELDS)
+            if scooter is None:
+                return
+            state = {field: float(getattr(scooter, field)) for field in _PRIORITY_FIELDS}
+            self._state[scooter_id] = state
+        for field in _PRIORITY_FIELDS:
+            if field in values:
+                state[field] = float(values[field])
+
+        self._invalidate(scooter_id)
+        deficit = state['soc_range_min'] - state['soc']
+        if deficit <= 0 and scooter_id in self._taken:
+            self._taken.discard(scooter_id)
+            release_jobs([scooter_id])
+        elif deficit > 0 and scooter_id not in self._taken:
+            entry = [-deficit, -state['battery_capacity'], scooter_id, True]
+            self._entries[scooter_id] = entry
+            heapq.heappush(self._heap, entry)
+
+    def remove(self, scooter_id):
+        self._invalidate(scooter_id)
+        self._state.pop(scooter_id, None)
+        if scooter_id in self._taken:
+            self._taken.discard(scooter_id)
+            release_jobs([scooter_id])
+
+    def pop_jobs(self, count):
+        """
+        Take the next `count` charging jobs as (scooter_id, deficit, battery_capacity) tuples and
+        record them in charging_jobs. Jobs another session took meanwhile are skipped.
+        """
+        jobs = []
+        while self._heap and len(jobs) < count:
+            candidates = []
+            while self._heap and len(jobs) + len(candidates) < count:
+                entry = heapq.heappop(self._heap)
+                if entry[3]:
+                    candidates.append(entry)
+            claimed = take_jobs([entry[2] for entry in candidates])
+            if claimed is None:
+                # Nothing was recorded, so nothing is handed out; keep the jobs queued
+                for entry in candidates:
+                    heapq.heappush(self._heap, entry)
+                break
+            claimed = set(claimed)
+            for neg_deficit, neg_capacity, scooter_id, _ in candidates:
+                del self._entries[scooter_id]
+                self._taken.add(scooter_id)
+                if scooter_id in claimed:
+                    jobs.append((scooter_id, -neg_deficit, -neg_capacity))
+        return jobs
+
+    def on_scooter_change(self, action, scooter_id, fields):
+        if action == events.DELETED:
+            self.remove(scooter_id)
+        elif action == events.CREATED or any(field in fields for field in _PRIORITY_FIELDS):
+            self.update(scooter_id, fields)
+
+
+_scheduler = None
+_scheduler_changes = None  # scooters change counter the scheduler is current with
+
+
+def _read_changes():
+    conn = open_connection()
+    try:
+        return read_change_counters(conn, ('scooters', 'charging_jobs'))
+    finally:
+        close_connection(conn)
+
+
+def _on_scooter_change(action, scooter_id, fields):
+    global _scheduler_changes
+    if _scheduler is not None:
+        _scheduler.on_scooter_change(action, scooter_id, fields)
+        # Our own write (and any job it released) must not force a reseed
+        _scheduler_changes = _read_changes()
+
+
+def get_charging_scheduler():
+    """Return the shared scheduler, (re)seeding it on first use or after an outside change."""
+    global _scheduler, _scheduler_changes
+    changes = _read_changes()
+    if _scheduler is None or changes != _scheduler_changes:
+        if PLAINTEXT_TELEMETRY:
+            _scheduler = ChargingScheduler.from_database()
+        else:
+            _scheduler = ChargingScheduler.from_snapshot(get_fleet_snapshot())
+        _scheduler_changes = changes
+        events.unsubscribe("scooter", _on_scooter_change)
+        events.subscribe("scooter", _on_scooter_change)
+    return _scheduler
+
+
+def take_charging_jobs(count):
+    """Hand out the next `count` jobs of the shared scheduler."""
+    global _scheduler_changes
+    jobs = get_charging_scheduler().pop_jobs(count)
+    _scheduler_changes = _read_changes()
+    return jobs
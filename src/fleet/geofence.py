@@ -0,0 +1,158 @@
+"""
+Geofence engine.
+Loads the service area, no-parking zones and speed zones from data/geofences.json.
+Every zone polygon gets a uniform grid over its bounding box in which each cell is
+precomputed as inside, outside or boundary (crossed by a polygon edge), so most point
+tests are a single array lookup; only points in boundary cells fall back to ray casting.
+"""
+import json
+import os
+import numpy as np
+
+GEOFENCE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "geofences.json")
+# Cell edge in degrees, roughly 220 m north-south and 140 m east-west in Rotterdam
+GRID_CELL_SIZE = 0.002
+
+OUTSIDE, INSIDE, BOUNDARY = 0, 1, 2
+
+
+def _points_in_polygon(latitudes, longitudes, polygon):
+    """Vectorized even-odd ray casting for arrays of points against one polygon."""
+    lat = np.asarray(latitudes, dtype=np.float64)[:, None]
+    lon = np.asarray(longitudes, dtype=np.float64)[:, None]
+    y1, x1 = polygon[:, 0], polygon[:, 1]
+    y2, x2 = np.roll(y1, -1), np.roll(x1, -1)
+    straddles = (y1 > lat) != (y2 > lat)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crossing_lon = x1 + (lat - y1) * (x2 - x1) / (y2 - y1)
+    crosses = straddles & (lon < crossing_lon)
+    return crosses.sum(axis=1) % 2 == 1
+
+
+class Zone:
+    def __init__(self, name, polygon, max_speed=None, cell_size=GRID_CELL_SIZE):
+        self.name = name
+        self.polygon = np.asarray(polygon, dtype=np.float64)
+        self.max_speed = max_speed
+        self.cell_size = cell_size
+        self.min_lat, self.min_lon = self.polygon.min(axis=0)
+        self.max_lat, self.max_lon = self.polygon.max(axis=0)
+        self.rows = max(1, int(np.ceil((self.max_lat - self.min_lat) / cell_size)))
+        self.cols = max(1, int(np.ceil((self.max_lon - self.min_lon) / cell_size)))
+        self.cells = self._build_grid()
+
+    def _build_grid(self):
+        cells = np.full((self.rows, self.cols), OUTSIDE, dtype=np.int8)
+        size = self.cell_size
+
+        # Mark every cell that a polygon edge passes through: the edge's bounding box
+        # overlaps the cell and the cell corners are not all on one side of the edge
+        for (lat1, lon1), (lat2, lon2) in zip(self.polygon, np.roll(self.polygon, -1, axis=0)):
+            r0, r1 = self._row(min(lat1, lat2)), self._row(max(lat1, lat2))
+            c0, c1 = self._col(min(lon1, lon2)), self._col(max(lon1, lon2))
+            rows = np.arange(r0, r1 + 1)[:, None]
+            cols = np.arange(c0, c1 + 1)[None, :]
+            sides = []
+            for dr, dc in ((0, 0), (0, 1), (1, 0), (1, 1)):
+                corner_lat = self.min_lat + (rows + dr) * size
+                corner_lon = self.min_lon + (cols + dc) * size
+                sides.append((lat2 - lat1) * (corner_lon - lon1) - (lon2 - lon1) * (corner_lat - lat1))
+            sides = np.stack(sides)
+            crossed = (sides.min(axis=0) <= 0) & (sides.max(axis=0) >= 0)
+            cells[r0:r1 + 1, c0:c1 + 1][crossed] = BOUNDARY
+
+        # Cells no edge passes through are entirely inside or outside; their centre decides
+        free_rows, free_cols = np.nonzero(cells != BOUNDARY)
+        inside = _points_in_polygon(self.min_lat + (free_rows + 0.5) * size,
+                                    self.min_lon + (free_cols + 0.5) * size, self.polygon)
+        cells[free_rows[inside], free_cols[inside]] = INSIDE
+        return cells
+
+    def _row(self, lat):
+        return min(max(int((lat - self.min_lat) / self.cell_size), 0), self.rows - 1)
+
+    def _col(self, lon):
+        return min(max(int((lon - self.min_lon) / self.cell_size), 0), self.cols - 1)
+
+    def contains(self, latitude, longitude):
+        if not (self.min_lat <= latitude <= self.max_lat and self.min_lon <= longitude <= self.max_lon):
+            return False
+        state = self.cells[self._row(latitude), self._col(longitude)]
+        if state == BOUNDARY:
+            return bool(_points_in_polygon([latitude], [longitude], self.polygon)[0])
+        return state == INSIDE
+
+    def contains_many(self, latitudes, longitudes):
+        """Boolean mask for arrays of points; ray casting only runs for points in boundary cells."""
+        lat = np.asarray(latitudes, dtype=np.float64)
+        lon = np.asarray(longitudes, dtype=np.float64)
+        result = np.zeros(len(lat), dtype=bool)
+        in_box = (lat >= self.min_lat) & (lat <= self.max_lat) & (lon >= self.min_lon) & (lon <= self.max_lon)
+
+        box_lat, box_lon = lat[in_box], lon[in_box]
+        rows = np.clip(((box_lat - self.min_lat) / self.cell_size).astype(np.int64), 0, self.rows - 1)
+        cols = np.clip(((box_lon - self.min_lon) / self.cell_size).astype(np.int64), 0, self.cols - 1)
+        state = self.cells[rows, cols]
+        inside = state == INSIDE
+        boundary = state == BOUNDARY
+        if boundary.any():
+            inside[boundary] = _points_in_polygon(box_lat[boundary], box_lon[boundary], self.polygon)
+        result[in_box] = inside
+        return result
+
+
+class Geofences:
+    def __init__(self, service_area=(), no_parking=(), speed_zones=()):
+        self.service_area = list(service_area)
+        self.no_parking = list(no_parking)
+        self.speed_zones = list(speed_zones)
+
+    @classmethod
+    def load(cls, path=GEOFENCE_PATH):
+        """Read zones from a JSON file; a missing file means no restrictions beyond the bounding box."""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+
+        def zones(key):
+            return [Zone(zone["name"], zone["polygon"], zone.get("max_speed")) for zone in data.get(key, [])]
+
+        return cls(zones("service_area"), zones("no_parking"), zones("speed_zones"))
+
+    def in_service_area(self, latitude, longitude):
+        if not self.service_area:
+            return True
+        return any(zone.contains(latitude, longitude) for zone in self.service_area)
+
+    def no_parking_zone(self, latitude, longitude):
+        """The no-parking zone containing the point, or None."""
+        for zone in self.no_parking:
+            if zone.contains(latitude, longitude):
+                return zone
+        return None
+
+    def speed_cap(self, latitude, longitude):
+        """Lowest max_speed of the speed zones containing the point, or None when uncapped."""
+        caps = [zone.max_speed for zone in self.speed_zones if zone.contains(latitude, longitude)]
+        return min(caps) if caps else None
+
+    def outside_service_area(self, latitudes, longitudes):
+        """Boolean mask of the points that are not in any service area polygon."""
+        if not self.service_area:
+            return np.zeros(len(latitudes), dtype=bool)
+        inside = np.zeros(len(latitudes), dtype=bool)
+        for zone in self.service_area:
+            inside |= zone.contains_many(latitudes, longitudes)
+        return ~inside
+
+
+_geofences = None
+
+
+def get_geofences():
+    """Return the shared geofences, loading and gridding them on first use."""
+    global _geofences
+    if _geofences is None:
+        _geofences = Geofences.load()
+    return _geofences
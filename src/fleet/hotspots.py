@@ -0,0 +1,70 @@
+"""
+Hotspot analysis for rebalancing.
+Counts available scooters per cell of a uniform grid laid over the Rotterdam service
+area and compares each cell with the fleet-wide average, so over- and under-supplied
+zones stand out. Coordinates come from the fleet snapshot, which is kept current from
+scooter change events, so the analysis can be rerun at any time without decrypting.
+"""
+import numpy as np
+
+from fleet.analytics import get_fleet_snapshot
+from security.validation import Validation
+
+# Cell edge in degrees; 0.01 is roughly 1.1 km north-south and 0.7 km east-west here
+CELL_SIZE_DEGREES = 0.01
+# A cell is over-supplied above OVER_FACTOR x the average and under-supplied below UNDER_FACTOR x
+OVER_FACTOR = 2.0
+UNDER_FACTOR = 0.5
+
+
+class HotspotGrid:
+    def __init__(self, cell_size=CELL_SIZE_DEGREES):
+        self.cell_size = cell_size
+        self.rows = int(np.ceil(round((Validation.MAX_LATITUDE - Validation.MIN_LATITUDE) / cell_size, 6)))
+        self.cols = int(np.ceil(round((Validation.MAX_LONGITUDE - Validation.MIN_LONGITUDE) / cell_size, 6)))
+
+    def cell_counts(self, latitudes, longitudes):
+        """Scooters per cell as a (rows, cols) array; points outside the service area are ignored."""
+        inside = ((latitudes >= Validation.MIN_LATITUDE) & (latitudes <= Validation.MAX_LATITUDE)
+                  & (longitudes >= Validation.MIN_LONGITUDE) & (longitudes <= Validation.MAX_LONGITUDE))
+        row = np.minimum(((latitudes[inside] - Validation.MIN_LATITUDE) / self.cell_size).astype(np.int64), self.rows - 1)
+        col = np.minimum(((longitudes[inside] - Validation.MIN_LONGITUDE) / self.cell_size).astype(np.int64), self.cols - 1)
+        counts = np.bincount(row * self.cols + col, minlength=self.rows * self.cols)
+        return counts.reshape(self.rows, self.cols)
+
+    def cell_center(self, row, col):
+        return (round(Validation.MIN_LATITUDE + (row + 0.5) * self.cell_size, 5),
+                round(Validation.MIN_LONGITUDE + (col + 0.5) * self.cell_size, 5))
+
+
+def rebalancing_report(snapshot=None, cell_size=CELL_SIZE_DEGREES, over_factor=OVER_FACTOR, under_factor=UNDER_FACTOR):
+    """
+    Compare in-service scooters per cell with the average over the grid.
+    Returns a dict with the average and lists of (center, count, surplus) for over-supplied
+    cells and (center, count, deficit) for under-supplied cells, largest imbalance first.
+    """
+    snapshot = snapshot or get_fleet_snapshot()
+    available = snapshot.active & (snapshot.columns['out_of_service'] == 0)
+    grid = HotspotGrid(cell_size)
+    counts = grid.cell_counts(snapshot.columns['location_latitude'][available],
+                              snapshot.columns['location_longitude'][available])
+
+    average = counts.mean()
+    target = int(np.ceil(average))
+    over_rows, over_cols = np.nonzero(counts > max(over_factor * average, target))
+    under_rows, under_cols = np.nonzero(counts < under_factor * average)
+
+    over = [(grid.cell_center(r, c), int(counts[r, c]), int(counts[r, c]) - target)
+            for r, c in zip(over_rows.tolist(), over_cols.tolist())]
+    under = [(grid.cell_center(r, c), int(counts[r, c]), target - int(counts[r, c]))
+             for r, c in zip(under_rows.tolist(), under_cols.tolist())]
+    over.sort(key=lambda cell: -cell[2])
+    under.sort(key=lambda cell: -cell[2])
+
+    return {
+        'available': int(counts.sum()),
+        'cells': counts.size,
+        'average': float(average),
+        'over_supplied': over,
+        'under_supplied': under,
+    }
@@ -0,0 +1,192 @@
+"""
+Maintenance scheduler.
+Keeps every scooter in a list sorted by maintenance due date, derived from
+last_maintenance_date plus an interval that is shorter for high-mileage scooters.
+"Overdue" and "due in the next N days" are bisect range queries on that list, and the
+index is updated incrementally from scooter change events instead of decrypting the table.
+Other checks (e.g. battery health) can flag a scooter, which makes it due on the flag
+date until its next maintenance is recorded. Flags are stored in maintenance_flags, and the
+shared scheduler is rebuilt when scooters or flags were changed outside its events.
+"""
+import bisect
+from datetime import date, timedelta
+
+from models import events
+from models.db import open_connection, close_connection, read_change_counters
+from models.maintenance_flags import load_flags, save_flag, clear_flag
+from models.scooter import iter_scooters, get_scooter_by_id
+
+MAINTENANCE_INTERVAL_DAYS = 180
+HIGH_MILEAGE_KM = 5000
+HIGH_MILEAGE_INTERVAL_DAYS = 90
+
+# Scooters without a known maintenance date sort first, i.e. they are always overdue
+_NEVER_MAINTAINED = date(1970, 1, 1)
+_DUE_FIELDS = ('last_maintenance_date', 'mileage')
+BUILD_PAGE_SIZE = 1000
+
+
+class MaintenancePolicy:
+    def __init__(self, interval_days=MAINTENANCE_INTERVAL_DAYS, high_mileage_km=HIGH_MILEAGE_KM,
+                 high_mileage_interval_days=HIGH_MILEAGE_INTERVAL_DAYS):
+        self.interval_days = interval_days
+        self.high_mileage_km = high_mileage_km
+        self.high_mileage_interval_days = high_mileage_interval_days
+
+    def due_date(self, last_maintenance_date, mileage):
+        if not last_maintenance_date:
+            return _NEVER_MAINTAINED
+        try:
+            last = date.fromisoformat(str(last_maintenance_date))
+        except ValueError:
+            return _NEVER_MAINTAINED
+        high_mileage = mileage is not None and int(mileage) >= self.high_mileage_km
+        days = self.high_mileage_interval_days if high_mileage else self.interval_days
+        return last + timedelta(days=days)
+
+
+class MaintenanceScheduler:
+    def __init__(self, policy=None):
+        self.policy = policy or MaintenancePolicy()
+        self._index = []  # sorted (due_date, scooter_id)
+        self._key_of = {}  # scooter id -> its (due_date, scooter_id) entry
+        self._state = {}   # scooter id -> {'last_maintenance_date', 'mileage'}
+        self._flags = {}   # scooter id -> (flag date, reason)
+
+    @classmethod
+    def build(cls, scooters, policy=None, flags=None):
+        scheduler = cls(policy)
+        scheduler._flags = dict(flags or {})
+        for scooter in scooters:
+            scheduler._state[scooter.id] = {
+                'last_maintenance_date': scooter.last_maintenance_date, 'mileage': scooter.mileage
+            }
+            key = (scheduler._due(scooter.id), scooter.id)
+            scheduler._key_of[scooter.id] = key
+            scheduler._index.append(key)
+        scheduler._index.sort()
+        return scheduler
+
+    def __len__(self):
+        return len(self._index)
+
+    def _due(self, scooter_id):
+        state = self._state[scooter_id]
+        due = self.policy.due_date(state['last_maintenance_date'], state['mileage'])
+        flag = self._flags.get(scooter_id)
+        return min(due, flag[0]) if flag else due
+
+    def _remove_key(self, scooter_id):
+        key = self._key_of.pop(scooter_id, None)
+        if key is not None:
+            position = bisect.bisect_left(self._index, key)
+            if position < len(self._index) and self._index[position] == key:
+                del self._index[position]
+
+    def update(self, scooter_id, values):
+        if scooter_id not in self._state:
+            scooter = get_scooter_by_id(scooter_id, fields=_DUE_FIELDS)
+            if scooter is None:
+                return
+            self._state[scooter_id] = {
+                'last_maintenance_date': scooter.last_maintenance_date, 'mileage': scooter.mileage
+            }
+        for field in _DUE_FIELDS:
+            if field in values:
+                self._state[scooter_id][field] = values[field]
+        # Recording a maintenance date resolves any outstanding flag
+        if 'last_maintenance_date' in values and self._flags.pop(scooter_id, None):
+            clear_flag(scooter_id)
+
+        self._remove_key(scooter_id)
+        key = (self._due(scooter_id), scooter_id)
+        self._key_of[scooter_id] = key
+        bisect.insort(self._index, key)
+
+    def remove(self, scooter_id):
+        self._remove_key(scooter_id)
+        self._state.pop(scooter_id, None)
+        if self._flags.pop(scooter_id, None):
+            clear_flag(scooter_id)
+
+    def flag(self, scooter_id, reason, today=None):
+        """Make a scooter due for maintenance now, e.g. because a health check found a problem."""
+        if scooter_id in self._flags:
+            self._flags[scooter_id] = (self._flags[scooter_id][0], reason)
+            save_flag(scooter_id, self._flags[scooter_id][0], reason)
+            return
+        self._flags[scooter_id] = (today or date.today(), reason)
+        save_flag(scooter_id, self._flags[scooter_id][0], reason)
+        self.update(scooter_id, {})
+
+    def flag_reason(self, scooter_id):
+        flag = self._flags.get(scooter_id)
+        return flag[1] if flag else None
+
+    def due_date_of(self, scooter_id):
+        key = self._key_of.get(scooter_id)
+        return key[0] if key else None
+
+    def overdue(self, today=None):
+        """(due_date, scooter_id) pairs for scooters whose due date has passed, oldest first."""
+        today = today or date.today()
+        end = bisect.bisect_left(self._index, (today,))
+        return self._index[:end]
+
+    def due_within(self, days=7, today=None):
+        """(due_date, scooter_id) pairs that fall due from today up to and including today + days."""
+        today = today or date.today()
+        start = bisect.bisect_left(self._index, (today,))
+        end = bisect.bisect_left(self._index, (today + timedelta(days=days + 1),))
+        return self._index[start:end]
+
+    def on_scooter_change(self, action, scooter_id, fields):
+        if action == events.DELETED:
+            self.remove(scooter_id)
+        elif action == events.CREATED or any(field in fields for field in _DUE_FIELDS):
+            self.update(scooter_id, fields)
+
+
+_scheduler = None
+_scheduler_changes = None  # (scooters, maintenance_flags) change counters the scheduler is current with
+
+
+def _read_changes():
+    conn = open_connection()
+    try:
+        return read_change_counters(conn, ('scooters', 'maintenance_flags'))
+    finally:
+        close_connection(conn)
+
+
+def _on_scooter_change(action, scooter_id, fields):
+    global _scheduler_changes
+    if _scheduler is not None:
+        _scheduler.on_scooter_change(action, scooter_id, fields)
+        # Our own write (and any flag it cleared) must not force a rebuild
+        _scheduler_changes = _read_changes()
+
+
+def get_maintenance_scheduler():
+    """Return the shared scheduler, (re)building the index on first use or after an outside change."""
+    global _scheduler, _scheduler_changes
+    changes = _read_changes()
+    if _scheduler is None or changes != _scheduler_changes:
+        from models.read_model import read_model
+        if read_model.is_loaded("scooter"):
+            scooters = read_model.all_scooters()
+        else:
+            scooters = iter_scooters(page_size=BUILD_PAGE_SIZE, fields=_DUE_FIELDS)
+        _scheduler = MaintenanceScheduler.build(scooters, flags=load_flags())
+        _scheduler_changes = changes
+        events.unsubscribe("scooter", _on_scooter_change)
+        events.subscribe("scooter", _on_scooter_change)
+    return _scheduler
+
+
+def flag_scooter(scooter_id, reason):
+    """Flag a scooter in the shared scheduler and the maintenance_flags table."""
+    global _scheduler_changes
+    scheduler = get_maintenance_scheduler()
+    scheduler.flag(scooter_id, reason)
+    _scheduler_changes = _read_changes()
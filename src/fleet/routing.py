@@ -0,0 +1,86 @@
+"""
+Service route planning for field engineers.
+Builds a visiting order over flagged scooters with a nearest-neighbour tour from the
+start point, then improves it with 2-opt until no improving move is left or the time
+budget runs out. Distances are great-circle kilometres from a precomputed matrix.
+"""
+import time
+import numpy as np
+
+# Default start point: Rotterdam Centraal
+DEPOT = (51.92440, 4.46900)
+TIME_LIMIT_SECONDS = 1.0
+EARTH_RADIUS_KM = 6371.0
+
+
+def distance_matrix(coordinates):
+    """Pairwise haversine distances in km for an (n, 2) array of (lat, lon) in degrees."""
+    radians = np.radians(np.asarray(coordinates, dtype=np.float64))
+    lat = radians[:, 0][:, None]
+    lon = radians[:, 1][:, None]
+    a = np.sin((lat - lat.T) / 2) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin((lon - lon.T) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _nearest_neighbour(distances):
+    """Open tour starting at node 0 that always moves to the closest unvisited node."""
+    n = len(distances)
+    visited = np.zeros(n, dtype=bool)
+    visited[0] = True
+    tour = [0]
+    for _ in range(n - 1):
+        row = np.where(visited, np.inf, distances[tour[-1]])
+        nxt = int(np.argmin(row))
+        visited[nxt] = True
+        tour.append(nxt)
+    return np.array(tour)
+
+
+def _two_opt(tour, distances, deadline):
+    """
+    Improve an open tour (node 0 fixed as start) by reversing segments.
+    For each i all candidate j are evaluated at once; stops at a local optimum or the deadline.
+    """
+    n = len(tour)
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(1, n - 1):
+            a, b = tour[i - 1], tour[i]
+            c = tour[i + 1:]
+            # Successor of each c; the last node has none, so that edge costs nothing
+            d = np.append(tour[i + 2:], -1)
+            has_d = d >= 0
+            d_safe = np.where(has_d, d, 0)
+            delta = (distances[a, c] - distances[a, b]
+                     + np.where(has_d, distances[b, d_safe] - distances[c, d_safe], 0.0))
+            best = int(np.argmin(delta))
+            if delta[best] < -1e-9:
+                j = i + 1 + best
+                tour[i:j + 1] = tour[i:j + 1][::-1]
+                improved = True
+            if time.perf_counter() >= deadline:
+                break
+    return tour
+
+
+def plan_route(stops, start=DEPOT, time_limit=TIME_LIMIT_SECONDS):
+    """
+    Order `stops` ((scooter_id, latitude, longitude) tuples) into a short route from `start`.
+    Returns (scooter_id, leg_km, cumulative_km) tuples in visiting order.
+    """
+    if not stops:
+        return []
+    deadline = time.perf_counter() + time_limit
+    coordinates = [start] + [(float(lat), float(lon)) for _, lat, lon in stops]
+    distances = distance_matrix(coordinates)
+
+    tour = _two_opt(_nearest_neighbour(distances), distances, deadline)
+
+    route = []
+    cumulative = 0.0
+    for previous, current in zip(tour[:-1], tour[1:]):
+        leg = float(distances[previous, current])
+        cumulative += leg
+        route.append((stops[current - 1][0], leg, cumulative))
+    return route
@@ -1,4 +1,4 @@
-import os, re, getpass
+import os, re, getpass, itertools
 class general_methods:
     @staticmethod
     def clear_console():
@@ -18,4 +18,29 @@ class general_methods:
     
     @staticmethod
     def hidden_input(prompt=""):
-        return getpass.getpass(prompt)
\ No newline at end of file
+        return getpass.getpass(prompt)
+
+    @staticmethod
+    def paginate(items, render, page_size=20):
+        """
+        Show items page by page, pulling only one page (plus one look-ahead item) from the
+        iterator at a time. Returns the number of items shown.
+        """
+        iterator = iter(items)
+        shown = 0
+        page = 1
+        batch = list(itertools.islice(iterator, page_size + 1))
+        while True:
+            for item in batch[:page_size]:
+                render(item)
+            shown += len(batch[:page_size])
+
+            # Without a look-ahead item there is no next page to offer
+            if len(batch) <= page_size:
+                return shown
+
+            choice = input(f"\n-- Page {page} -- [Enter] next page, [q] stop: ").strip().lower()
+            if choice == 'q':
+                return shown
+            page += 1
+            batch = batch[page_size:] + list(itertools.islice(iterator, page_size))
@@ -0,0 +1,55 @@
+"""Persisted charging jobs that have been handed out, so a reseed or another session does not hand them out again."""
+import sqlite3
+from datetime import datetime
+from models.db import open_connection, close_connection
+
+
+def load_taken_jobs():
+    """Ids of the scooters whose charging job has been handed out."""
+    conn = open_connection()
+    try:
+        return {scooter_id for (scooter_id,) in conn.execute("SELECT scooter_id FROM charging_jobs")}
+    except sqlite3.Error as e:
+        print(f"An error occurred while reading charging jobs: {e}")
+        return set()
+    finally:
+        close_connection(conn)
+
+
+def take_jobs(scooter_ids):
+    """
+    Claim the jobs of the given scooters and return the ids that were claimed; a job another
+    session already took is skipped. None if the claim failed as a whole.
+    """
+    taken_at = datetime.now().isoformat(timespec='seconds')
+    conn = open_connection()
+    try:
+        claimed = []
+        for scooter_id in scooter_ids:
+            cursor = conn.execute("INSERT OR IGNORE INTO charging_jobs (scooter_id, taken_at) VALUES (?, ?)",
+                                  (scooter_id, taken_at))
+            if cursor.rowcount:
+                claimed.append(scooter_id)
+        conn.commit()
+        return claimed
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"An error occurred while taking charging jobs: {e}")
+        return None
+    finally:
+        close_connection(conn)
+
+
+def release_jobs(scooter_ids):
+    """Forget handed-out jobs, e.g. once the scooter is charged, so it can be queued again."""
+    scooter_ids = list(scooter_ids)
+    if not scooter_ids:
+        return
+    conn = open_connection()
+    try:
+        conn.executemany("DELETE FROM charging_jobs WHERE scooter_id = ?", [(scooter_id,) for scooter_id in scooter_ids])
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"An error occurred while releasing charging jobs: {e}")
+    finally:
+        close_connection(conn)
@@ -1,5 +1,6 @@
 import sqlite3
 import os
+from security.encryption import decrypt_message, load_symmetric_key, blind_index
 
 def get_db_path():
     # Find the root of the project (one directory above 'src')
@@ -11,6 +12,23 @@ def get_db_path():
 
 db_path = get_db_path()
 
+# Non-personal scooter telemetry is stored as typed plaintext so SQLite can filter and
+# aggregate it with indexes; brand, model, serial number and location stay encrypted.
+PLAINTEXT_TELEMETRY = True
+TELEMETRY_COLUMNS = ('top_speed', 'battery_capacity', 'soc', 'soc_range_min', 'soc_range_max', 'out_of_service', 'mileage')
+
+def telemetry_value(column, value):
+    """The typed value stored in a plaintext telemetry column."""
+    if column == 'out_of_service':
+        return 1 if value in (True, 1, 'True', 'yes') else 0
+    if column == 'battery_capacity':
+        return float(value)
+    return int(float(value))
+
+# Tables whose writes are counted by triggers, so in-process caches can cheaply tell
+# whether another connection changed them (PRAGMA data_version also moves for log writes)
+COUNTED_TABLES = ('scooters', 'travellers', 'users', 'maintenance_flags', 'charging_jobs')
+
 def open_connection():
     """Open a connection to the SQLite database."""
     conn = sqlite3.connect(db_path)
@@ -35,7 +53,10 @@ def initialize_database():
             password TEXT NOT NULL,
             role TEXT NOT NULL,
             registration_date TEXT NOT NULL,
-            temporary_password BOOLEAN NOT NULL DEFAULT 0
+            temporary_password BOOLEAN NOT NULL DEFAULT 0,
+            username_hash TEXT,
+            role_hash TEXT,
+            version INTEGER NOT NULL DEFAULT 1
         )
     ''')
 
@@ -54,7 +75,8 @@ def initialize_database():
             email TEXT NOT NULL UNIQUE,
             phone_number TEXT NOT NULL,
             license_number TEXT NOT NULL UNIQUE,
-            registration_date TEXT NOT NULL
+            registration_date TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 1
         )
     ''')
 
@@ -74,12 +96,81 @@ def initialize_database():
             location_longitude REAL NOT NULL,
             out_of_service BOOLEAN NOT NULL DEFAULT 0,
             mileage INTEGER NOT NULL DEFAULT 0,
-            last_maintenance_date DATE NOT NULL
-        
-            
+            last_maintenance_date DATE NOT NULL,
+            version INTEGER NOT NULL DEFAULT 1
         )
     ''')
     
+    # Table: scooter_history (append-only; location is encrypted, soc/mileage are telemetry)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scooter_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scooter_id INTEGER NOT NULL,
+            recorded_at INTEGER NOT NULL,
+            bucket_seconds INTEGER NOT NULL DEFAULT 0,
+            soc INTEGER NOT NULL,
+            soc_min INTEGER NOT NULL,
+            soc_max INTEGER NOT NULL,
+            mileage INTEGER NOT NULL,
+            location TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_scooter_history_scooter_time ON scooter_history (scooter_id, recorded_at)
+    ''')
+
+    # Table: settings (system-wide key/value settings, e.g. the calibrated bcrypt cost)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS settings (
+            name TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    ''')
+
+    # Table: maintenance_flags (scooters made due by a check, until their next maintenance)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS maintenance_flags (
+            scooter_id INTEGER PRIMARY KEY,
+            flagged_at TEXT NOT NULL,
+            reason TEXT NOT NULL
+        )
+    ''')
+
+    # Table: charging_jobs (charging jobs handed out, until the scooter is charged)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS charging_jobs (
+            scooter_id INTEGER PRIMARY KEY,
+            taken_at TEXT NOT NULL
+        )
+    ''')
+
+    # Table: login_failures (sliding-window login throttling; subject is a keyed hash or '*')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS login_failures (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            subject TEXT NOT NULL,
+            failed_at REAL NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_login_failures_subject_time ON login_failures (subject, failed_at)
+    ''')
+
+    # Table: sessions (token_hash is a keyed hash of the token; user_data is encrypted)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            token_hash TEXT NOT NULL UNIQUE,
+            user_id INTEGER NOT NULL,
+            user_data TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            revoked BOOLEAN NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions (user_id)")
+
     # Table: logs
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS logs (
@@ -102,5 +193,149 @@ def initialize_database():
             FOREIGN KEY(system_admin_id) REFERENCES users(id)
         )
     ''')
+    migrate_username_index(conn)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_username_hash ON users (username_hash)")
+    migrate_role_index(conn)
+    migrate_row_versions(conn)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_role_hash ON users (role_hash)")
+
+    create_change_counters(cursor)
+
+    if PLAINTEXT_TELEMETRY:
+        migrate_plaintext_telemetry(conn)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_scooters_service_soc ON scooters (out_of_service, soc)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_scooters_soc ON scooters (soc)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_scooters_mileage ON scooters (mileage)")
+    conn.commit()
+    close_connection(conn)
+
+def migrate_plaintext_telemetry(conn):
+    """
+    Decrypt telemetry columns that are still stored encrypted (text) into typed plaintext.
+    Only rows with a text value are touched, so this is a no-op once a database (or a
+    restored backup) has been migrated.
+    """
+    still_encrypted = " OR ".join(f"typeof({column}) = 'text'" for column in TELEMETRY_COLUMNS)
+    rows = conn.execute(f"SELECT id, {', '.join(TELEMETRY_COLUMNS)} FROM scooters WHERE {still_encrypted}").fetchall()
+    if not rows:
+        return 0
+
+    key = load_symmetric_key()
+    updates = []
+    for row in rows:
+        values = [
+            telemetry_value(column, decrypt_message(value, key) if isinstance(value, str) else value)
+            for column, value in zip(TELEMETRY_COLUMNS, row[1:])
+        ]
+        updates.append(values + [row[0]])
+    conn.executemany(
+        f"UPDATE scooters SET {', '.join(f'{column} = ?' for column in TELEMETRY_COLUMNS)} WHERE id = ?", updates
+    )
+    conn.commit()
+    return len(updates)
+
+def create_change_counters(cursor):
+    """One counter row per counted table, bumped by triggers on every insert, update and delete."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    for table in COUNTED_TABLES:
+        cursor.execute("INSERT OR IGNORE INTO change_counters (name, value) VALUES (?, 0)", (table,))
+        for operation in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS count_{table}_{operation.lower()} AFTER {operation} ON {table}
+                BEGIN
+                    UPDATE change_counters SET value = value + 1 WHERE name = '{table}';
+                END
+            ''')
+
+    # Serial numbers only change on insert, delete or an update of that column
+    cursor.execute("INSERT OR IGNORE INTO change_counters (name, value) VALUES ('scooter_serials', 0)")
+    for operation in ('INSERT', 'DELETE', 'UPDATE OF serial_number'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS count_scooter_serials_{operation.split()[0].lower()} AFTER {operation} ON scooters
+            BEGIN
+                UPDATE change_counters SET value = value + 1 WHERE name = 'scooter_serials';
+            END
+        ''')
+
+def read_change_counters(conn, names):
+    """Current values of the named counters, as a tuple in the same order."""
+    values = dict(conn.execute(
+        f"SELECT name, value FROM change_counters WHERE name IN ({', '.join('?' for _ in names)})", tuple(names)
+    ).fetchall())
+    return tuple(values.get(name) for name in names)
+
+class VersionConflictError(Exception):
+    """An update expected a row version that another write has already replaced."""
+
+    def __init__(self, table, row_id):
+        super().__init__(f"{table} {row_id} was changed or deleted by someone else")
+        self.table = table
+        self.row_id = row_id
+
+
+def versioned_update(cursor, table, row_id, assignments, values, expected_version=None):
+    """
+    UPDATE one row and bump its version. With an expected_version the write only goes through
+    if the row still has that version; otherwise VersionConflictError is raised.
+    Returns the number of rows changed.
+    """
+    sql = f"UPDATE {table} SET {assignments}, version = version + 1 WHERE id = ?"
+    values = list(values) + [row_id]
+    if expected_version is not None:
+        sql += " AND version = ?"
+        values.append(expected_version)
+    cursor.execute(sql, values)
+    if expected_version is not None and cursor.rowcount == 0:
+        raise VersionConflictError(table, row_id)
+    return cursor.rowcount
+
+def add_column_if_missing(conn, table, column, definition):
+    """ALTER TABLE ... ADD COLUMN for databases created before the column existed."""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in existing:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        return True
+    return False
+
+def migrate_username_index(conn):
+    """Add the username blind index column and fill it for users that do not have one yet."""
+    add_column_if_missing(conn, "users", "username_hash", "TEXT")
+    rows = conn.execute("SELECT id, username FROM users WHERE username_hash IS NULL").fetchall()
+    if not rows:
+        return 0
+
+    key = load_symmetric_key()
+    conn.executemany(
+        "UPDATE users SET username_hash = ? WHERE id = ?",
+        [(blind_index(decrypt_message(username, key), key), user_id) for user_id, username in rows]
+    )
+    conn.commit()
+    return len(rows)
+
+
+def migrate_role_index(conn):
+    """Add the role blind index column and fill it for users that do not have one yet."""
+    add_column_if_missing(conn, "users", "role_hash", "TEXT")
+    rows = conn.execute("SELECT id, role FROM users WHERE role_hash IS NULL").fetchall()
+    if not rows:
+        return 0
+
+    key = load_symmetric_key()
+    conn.executemany(
+        "UPDATE users SET role_hash = ? WHERE id = ?",
+        [(blind_index(decrypt_message(role, key), key), user_id) for user_id, role in rows]
+    )
+    conn.commit()
+    return len(rows)
+
+
+def migrate_row_versions(conn):
+    """Add the optimistic concurrency version column to the entity tables."""
+    for table in ("users", "travellers", "scooters"):
+        add_column_if_missing(conn, table, "version", "INTEGER NOT NULL DEFAULT 1")
     conn.commit()
-    close_connection(conn)
\ No newline at end of file
@@ -0,0 +1,52 @@
+from functools import lru_cache
+from security.encryption import decrypt_message
+
+
+@lru_cache(maxsize=None)
+def _column_positions(columns):
+    """Map each column name to its index in an (id, *columns) row. Shared by all rows of a query."""
+    return {column: index for index, column in enumerate(columns, start=1)}
+
+
+class LazyEntity:
+    """
+    Base class for compact entities built from an encrypted database row.
+    The row is kept as-is and each attribute is decrypted the first time it is read;
+    the plaintext is then stored in its slot so later reads cost nothing.
+    Subclasses declare their attributes in __slots__ and can override _convert.
+    """
+    __slots__ = ('_raw', '_positions', '_key')
+
+    # Attributes whose database column has a different name
+    _attribute_columns = {}
+
+    @classmethod
+    def from_row(cls, row, columns, key):
+        """Wrap an (id, *columns) row without decrypting anything yet."""
+        entity = cls.__new__(cls)
+        entity.id = row[0]
+        entity._raw = row
+        entity._positions = _column_positions(tuple(columns))
+        entity._key = key
+        return entity
+
+    def __getattr__(self, name):
+        # Only reached when a slot has not been filled yet
+        if name.startswith('_') or self._raw is None:
+            raise AttributeError(name)
+
+        column = self._attribute_columns.get(name, name)
+        index = self._positions.get(column)
+        value = None
+        raw = self._raw[index] if index is not None else None
+        if raw is not None and raw != '':
+            # Encrypted values are always text; plaintext columns come back typed
+            value = self._convert(column, decrypt_message(raw, self._key) if isinstance(raw, str) else raw)
+
+        # Memoize; fails with AttributeError for names that are not slots
+        setattr(self, name, value)
+        return value
+
+    def _convert(self, column, plain):
+        """Turn a decrypted string (or typed plaintext value) into the attribute value."""
+        return plain
@@ -0,0 +1,34 @@
+"""
+In-process change events.
+The write paths in models/*.py publish an event after every successful commit so that
+caches and indexes can update themselves without re-reading the whole table.
+"""
+
+CREATED = "created"
+UPDATED = "updated"
+DELETED = "deleted"
+
+_subscribers = {}
+
+
+def subscribe(entity, handler):
+    """Register handler(action, entity_id, fields) for changes to 'scooter', 'traveller' or 'user'."""
+    _subscribers.setdefault(entity, []).append(handler)
+
+
+def unsubscribe(entity, handler):
+    if handler in _subscribers.get(entity, []):
+        _subscribers[entity].remove(handler)
+
+
+def publish(entity, action, entity_id, fields=None):
+    """
+    Notify all subscribers of a committed change.
+    `fields` holds the plaintext values that were written (if known).
+    A failing subscriber must never break the write that triggered it.
+    """
+    for handler in list(_subscribers.get(entity, [])):
+        try:
+            handler(action, entity_id, fields or {})
+        except Exception as e:
+            print(f"An error occurred while handling a {entity} change event: {e}")
@@ -0,0 +1,44 @@
+"""Persisted maintenance flags, so a flagged scooter stays due across restarts and sessions."""
+import sqlite3
+from datetime import date
+from models.db import open_connection, close_connection
+
+
+def load_flags():
+    """{scooter_id: (flag date, reason)} for every outstanding flag."""
+    conn = open_connection()
+    try:
+        rows = conn.execute("SELECT scooter_id, flagged_at, reason FROM maintenance_flags").fetchall()
+        return {scooter_id: (date.fromisoformat(flagged_at), reason) for scooter_id, flagged_at, reason in rows}
+    except sqlite3.Error as e:
+        print(f"An error occurred while reading maintenance flags: {e}")
+        return {}
+    finally:
+        close_connection(conn)
+
+
+def save_flag(scooter_id, flagged_at, reason):
+    conn = open_connection()
+    try:
+        conn.execute('''
+            INSERT INTO maintenance_flags (scooter_id, flagged_at, reason) VALUES (?, ?, ?)
+            ON CONFLICT(scooter_id) DO UPDATE SET reason = excluded.reason
+        ''', (scooter_id, flagged_at.isoformat(), reason))
+        conn.commit()
+        return True
+    except sqlite3.Error as e:
+        print(f"An error occurred while saving a maintenance flag: {e}")
+        return False
+    finally:
+        close_connection(conn)
+
+
+def clear_flag(scooter_id):
+    conn = open_connection()
+    try:
+        conn.execute("DELETE FROM maintenance_flags WHERE scooter_id = ?", (scooter_id,))
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"An error occurred while clearing a maintenance flag: {e}")
+    finally:
+        close_connection(conn)
@@ -0,0 +1,239 @@
+"""
+Optional in-process read model.
+Holds decrypted, typed copies of scooters, travellers and users in indexed dicts (users are
+also bucketed per role) so that lookups and searches do not have to decrypt whole tables.
+It is loaded once after login, kept current through the change events published by
+models/*.py, and reloaded when the change counters of the entity tables show that another
+connection or process changed them.
+"""
+from itertools import islice
+
+from models.db import open_connection, close_connection, read_change_counters
+from models import events
+from models.scooter import Scooter, list_scooters, get_scooter_by_id
+from models.traveller import Traveller, list_travellers, get_traveller_by_id
+from models.user import User, list_users, get_user_by_id
+from controllers.rolecheck import is_authorized
+
+# Set to False to always read from the database
+READ_MODEL_ENABLED = True
+# Change counters of the tables held in memory
+HELD_TABLES = ('scooters', 'travellers', 'users')
+
+
+def _typed_scooter(scooter):
+    return Scooter(
+        scooter.id, scooter.brand, scooter.model, scooter.serial_number,
+        scooter.top_speed, scooter.battery_capacity, scooter.soc,
+        scooter.soc_range_min, scooter.soc_range_max,
+        float(scooter.location_latitude), float(scooter.location_longitude),
+        scooter.out_of_service, scooter.mileage, scooter.last_maintenance_date, scooter.version
+    )
+
+
+def _plain_traveller(traveller):
+    return Traveller(
+        traveller.id, traveller.first_name, traveller.last_name, traveller.date_of_birth, traveller.gender,
+        traveller.streetname, traveller.house_number, traveller.zip_code, traveller.city, traveller.email,
+        traveller.phone_number, traveller.license_number, traveller.registration_date, traveller.version
+    )
+
+
+def _plain_user(user):
+    return User(user.id, user.username, user.firstname, user.lastname, user.role, user.registration_date, user.version)
+
+
+class ReadModel:
+    def __init__(self):
+        self.loaded = set()  # entity names that are currently held in memory
+        self.scooters = {}
+        self.scooters_by_serial = {}
+        self.travellers = {}
+        self.travellers_by_email = {}
+        self.users = {}
+        self.users_by_username = {}
+        self.users_by_role = {}  # role -> {id: User}
+        self._conn = None
+        self._changes = None
+        self._current_user = None
+
+    def is_loaded(self, entity):
+        return entity in self.loaded
+
+    # --- loading -----------------------------------------------------------------
+
+    def load(self, current_user):
+        """Load all entities the user may read and start following change events."""
+        if not READ_MODEL_ENABLED:
+            return
+        self.clear()
+        self._current_user = current_user
+        self._conn = open_connection()
+        self._changes = self._read_changes()
+
+        for scooter in list_scooters():
+            self._put_scooter(_typed_scooter(scooter))
+        self.loaded.add("scooter")
+
+        if is_authorized(current_user.role, 'list_travellers'):
+            for traveller in list_travellers(current_user):
+                self._put_traveller(_plain_traveller(traveller))
+            self.loaded.add("traveller")
+
+        for user in list_users():
+            self._put_user(_plain_user(user))
+        self.loaded.add("user")
+
+        events.subscribe("scooter", self._on_scooter_change)
+        events.subscribe("traveller", self._on_traveller_change)
+        events.subscribe("user", self._on_user_change)
+
+    def clear(self):
+        """Drop everything, e.g. on logout."""
+        events.unsubscribe("scooter", self._on_scooter_change)
+        events.unsubscribe("traveller", self._on_traveller_change)
+        events.unsubscribe("user", self._on_user_change)
+        for index in (self.scooters, self.scooters_by_serial, self.travellers,
+                      self.travellers_by_email, self.users, self.users_by_username, self.users_by_role):
+            index.clear()
+        self.loaded.clear()
+        close_connection(self._conn)
+        self._conn = None
+        self._changes = None
+
+    def _read_changes(self):
+        # Only writes to the entity tables count; log writes and the like do not
+        return read_change_counters(self._conn, HELD_TABLES)
+
+    def _refresh_if_stale(self):
+        """Reload when another connection committed something we did not see an event for."""
+        if not self.loaded:
+            return
+        if self._read_changes() != self._changes:
+            self.load(self._current_user)
+
+    def _mark_seen(self):
+        # Our own write also bumps the counters; remember them so it does not trigger a reload
+        self._changes = self._read_changes()
+
+    # --- index maintenance -------------------------------------------------------
+
+    def _put_scooter(self, scooter):
+        self._drop_scooter(scooter.id)
+        self.scooters[scooter.id] = scooter
+        self.scooters_by_serial[scooter.serial_number] = scooter
+
+    def _drop_scooter(self, scooter_id):
+        old = self.scooters.pop(scooter_id, None)
+        if old is not None:
+            self.scooters_by_serial.pop(old.serial_number, None)
+
+    def _put_traveller(self, traveller):
+        self._drop_traveller(traveller.id)
+        self.travellers[traveller.id] = traveller
+        self.travellers_by_email[traveller.email.lower()] = traveller
+
+    def _drop_traveller(self, traveller_id):
+        old = self.travellers.pop(traveller_id, None)
+        if old is not None:
+            self.travellers_by_email.pop(old.email.lower(), None)
+
+    def _put_user(self, user):
+        self._drop_user(user.id)
+        self.users[user.id] = user
+        self.users_by_username[user.username.lower()] = user
+        self.users_by_role.setdefault(user.role, {})[user.id] = user
+
+    def _drop_user(self, user_id):
+        old = self.users.pop(user_id, None)
+        if old is not None:
+            self.users_by_username.pop(old.username.lower(), None)
+            self.users_by_role.get(old.role, {}).pop(user_id, None)
+
+    # --- change events -----------------------------------------------------------
+
+    def _on_scooter_change(self, action, scooter_id, fields):
+        if action == events.DELETED:
+            self._drop_scooter(scooter_id)
+        else:
+            scooter = get_scooter_by_id(scooter_id)
+            if scooter:
+                self._put_scooter(_typed_scooter(scooter))
+            else:
+                self._drop_scooter(scooter_id)
+        self._mark_seen()
+
+    def _on_traveller_change(self, action, traveller_id, fields):
+        if "traveller" not in self.loaded:
+            return
+        if action == events.DELETED:
+            self._drop_traveller(traveller_id)
+        else:
+            traveller = get_traveller_by_id(traveller_id)
+            if traveller:
+                self._put_traveller(_plain_traveller(traveller))
+            else:
+                self._drop_traveller(traveller_id)
+        self._mark_seen()
+
+    def _on_user_change(self, action, user_id, fields):
+        if action == events.DELETED:
+            self._drop_user(user_id)
+        else:
+            user = get_user_by_id(user_id)
+            if user:
+                self._put_user(_plain_user(user))
+            else:
+                self._drop_user(user_id)
+        self._mark_seen()
+
+    # --- queries -----------------------------------------------------------------
+
+    def scooter_by_serial(self, serial_number):
+        self._refresh_if_stale()
+        return self.scooters_by_serial.get(serial_number)
+
+    def search_scooters(self, query, limit=None):
+        self._refresh_if_stale()
+        query = query.lower()
+        matches = (
+            s for s in self.scooters.values()
+            if query in s.brand.lower() or query in s.model.lower() or query in s.serial_number.lower()
+        )
+        return list(islice(matches, limit))
+
+    def user_by_username(self, username):
+        self._refresh_if_stale()
+        return self.users_by_username.get(username.lower())
+
+    def all_scooters(self):
+        self._refresh_if_stale()
+        return list(self.scooters.values())
+
+    def all_users(self):
+        self._refresh_if_stale()
+        return sorted(self.users.values(), key=lambda user: user.id)
+
+    def users_with_roles(self, roles):
+        """Users holding any of the roles, ordered by id, straight from the role buckets."""
+        self._refresh_if_stale()
+        users = [user for role in set(roles) for user in self.users_by_role.get(role, {}).values()]
+        return sorted(users, key=lambda user: user.id)
+
+    def traveller_by_email(self, email):
+        self._refresh_if_stale()
+        return self.travellers_by_email.get(email.lower())
+
+    def find_travellers(self, query, limit=None):
+        self._refresh_if_stale()
+        query = query.lower()
+        matches = (
+            t for t in self.travellers.values()
+            if any(query in str(value).lower() for value in
+                   (t.id, t.first_name, t.last_name, t.streetname, t.email, t.license_number))
+        )
+        return list(islice(matches, limit))
+
+
+# Shared instance used by the models and the login flow
+read_model = ReadModel()
@@ -1,11 +1,19 @@
 import sqlite3
-from models.db import open_connection, close_connection
+from models.db import open_connection, close_connection, PLAINTEXT_TELEMETRY, TELEMETRY_COLUMNS, telemetry_value, versioned_update
+from models.entity import LazyEntity
+from models import events
 from security.encryption import encrypt_message, decrypt_message, load_symmetric_key
 from logs.log import log_instance
 
-class Scooter:
-    def __init__(self, id, brand, model, serial_number, top_speed, battery_capacity, soc, soc_range_min, soc_range_max, location_latitude, location_longitude, out_of_service, mileage, last_maintenance_date=None):
-    
+class Scooter(LazyEntity):
+    __slots__ = (
+        'id', 'brand', 'model', 'serial_number', 'top_speed', 'battery_capacity', 'soc', 'soc_range_min',
+        'soc_range_max', 'location_latitude', 'location_longitude', 'out_of_service', 'mileage', 'last_maintenance_date',
+        'version'
+    )
+
+    def __init__(self, id, brand, model, serial_number, top_speed, battery_capacity, soc, soc_range_min, soc_range_max, location_latitude, location_longitude, out_of_service, mileage, last_maintenance_date=None, version=None):
+        self._raw = None
         self.id = id
         self.brand = brand
         self.model = model
@@ -20,6 +28,21 @@ class Scooter:
         self.out_of_service = out_of_service
         self.mileage = mileage
         self.last_maintenance_date = last_maintenance_date
+        self.version = version
+
+    def _convert(self, column, plain):
+        if column == 'out_of_service':
+            return plain in ('True', 1)
+        if column in TELEMETRY_COLUMNS:
+            return telemetry_value(column, plain)
+        return plain
+
+
+def _stored_value(column, value, key):
+    """What goes into the database for a column: typed telemetry or an encrypted string."""
+    if PLAINTEXT_TELEMETRY and column in TELEMETRY_COLUMNS:
+        return telemetry_value(column, value)
+    return encrypt_message(str(value), key)
 
 def create_scooter(brand, model, serial_number, top_speed, battery_capacity, soc, soc_range_min, soc_range_max, location_latitude, location_longitude, out_of_service, mileage, last_maintenance_date=None):
     conn = open_connection()
@@ -30,15 +53,15 @@ def create_scooter(brand, model, serial_number, top_speed, battery_capacity, soc
         brand_enc = encrypt_message(str(brand), key)
         model_enc = encrypt_message(str(model), key)
         serial_number_enc = encrypt_message(str(serial_number), key)
-        top_speed_enc = encrypt_message(str(top_speed), key)
-        battery_capacity_enc = encrypt_message(str(battery_capacity), key)
-        soc_enc = encrypt_message(str(soc), key)
-        soc_range_min_enc = encrypt_message(str(soc_range_min), key)
-        soc_range_max_enc = encrypt_message(str(soc_range_max), key)
+        top_speed_enc = _stored_value('top_speed', top_speed, key)
+        battery_capacity_enc = _stored_value('battery_capacity', battery_capacity, key)
+        soc_enc = _stored_value('soc', soc, key)
+        soc_range_min_enc = _stored_value('soc_range_min', soc_range_min, key)
+        soc_range_max_enc = _stored_value('soc_range_max', soc_range_max, key)
         location_latitude_enc = encrypt_message(str(location_latitude), key)
         location_longitude_enc = encrypt_message(str(location_longitude), key)
-        out_of_service_enc = encrypt_message(str(out_of_service), key)
-        mileage_enc = encrypt_message(str(mileage), key)
+        out_of_service_enc = _stored_value('out_of_service', out_of_service, key)
+        mileage_enc = _stored_value('mileage', mileage, key)
         last_maintenance_date_enc = encrypt_message(str(last_maintenance_date), key) if last_maintenance_date else None
 
         cursor.execute('''
@@ -52,6 +75,13 @@ def create_scooter(brand, model, serial_number, top_speed, battery_capacity, soc
             soc_range_max_enc, location_latitude_enc, location_longitude_enc, out_of_service_enc, mileage_enc, last_maintenance_date_enc
         ))
         conn.commit()
+        events.publish("scooter", events.CREATED, cursor.lastrowid, {
+            'brand': brand, 'model': model, 'serial_number': serial_number, 'top_speed': top_speed,
+            'battery_capacity': battery_capacity, 'soc': soc, 'soc_range_min': soc_range_min,
+            'soc_range_max': soc_range_max, 'location_latitude': location_latitude,
+            'location_longitude': location_longitude, 'out_of_service': out_of_service,
+            'mileage': mileage, 'last_maintenance_date': last_maintenance_date
+        })
         return True
     except sqlite3.Error as e:
         print(f"An error occurred while creating scooter: {e}")
@@ -59,42 +89,146 @@ def create_scooter(brand, model, serial_number, top_speed, battery_capacity, soc
     finally:
         close_connection(conn)
 
-def list_scooters():
+PAGE_SIZE = 50
+
+# Columns in table order (without id); also the names accepted by the `fields` projection
+SCOOTER_COLUMNS = (
+    'brand', 'model', 'serial_number', 'top_speed', 'battery_capacity', 'soc', 'soc_range_min',
+    'soc_range_max', 'location_latitude', 'location_longitude', 'out_of_service', 'mileage', 'last_maintenance_date',
+    'version'
+)
+
+def _projected_columns(fields):
+    """Return the requested columns in table order, rejecting unknown names (they end up in SQL)."""
+    if not fields:  # None or empty: all columns
+        return SCOOTER_COLUMNS
+    unknown = set(fields) - set(SCOOTER_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown scooter field(s): {', '.join(sorted(unknown))}")
+    return tuple(column for column in SCOOTER_COLUMNS if column in fields)
+
+def _row_to_scooter(row, key, columns=SCOOTER_COLUMNS):
+    """
+    Wrap an (id, *columns) row in a Scooter that decrypts each field on first access.
+    Fields outside the projection read as None.
+    """
+    return Scooter.from_row(row, columns, key)
+
+def list_scooters(fields=None):
+    columns = _projected_columns(fields)
     conn = open_connection()
     cursor = conn.cursor()
     key = load_symmetric_key()
     try:
-        cursor.execute('SELECT * FROM scooters')
+        cursor.execute(f"SELECT id, {', '.join(columns)} FROM scooters")
         rows = cursor.fetchall()
-        scooters = []
-        for row in rows:
-            id = row[0]
-            brand = decrypt_message(row[1], key)
-            model = decrypt_message(row[2], key)
-            serial_number = decrypt_message(row[3], key)
-            top_speed = decrypt_message(row[4], key)
-            battery_capacity = decrypt_message(row[5], key)
-            soc = decrypt_message(row[6], key)
-            soc_range_min = decrypt_message(row[7], key)
-            soc_range_max = decrypt_message(row[8], key)
-            location_latitude = decrypt_message(row[9], key)
-            location_longitude = decrypt_message(row[10], key)
-            out_of_service = decrypt_message(row[11], key) == 'True'
-            mileage = decrypt_message(row[12], key)
-            last_maintenance_date = decrypt_message(row[13], key) if row[13] else None
-
-            scooters.append(Scooter(
-                id, brand, model, serial_number, top_speed, battery_capacity, soc,
-                soc_range_min, soc_range_max, location_latitude, location_longitude,
-                out_of_service, mileage, last_maintenance_date
-            ))
-        return scooters
+        return [_row_to_scooter(row, key, columns) for row in rows]
     except sqlite3.Error as e:
         print(f"An error occurred while listing scooters: {e}")
         return []
     finally:
         close_connection(conn)
 
+def iter_scooters(page_size=PAGE_SIZE, after_id=0, fields=None):
+    """
+    Yield scooters ordered by id using keyset pagination.
+    Only one page of rows is fetched at a time and each row is decrypted when it is yielded,
+    so memory stays constant and the first scooter is available right away.
+    With `fields` only those columns are selected and decrypted.
+    """
+    columns = _projected_columns(fields)
+    key = load_symmetric_key()
+    while True:
+        conn = open_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT id, {', '.join(columns)} FROM scooters WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id, page_size)
+            )
+            rows = cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"An error occurred while listing scooters: {e}")
+            return
+        finally:
+            close_connection(conn)
+
+        for row in rows:
+            yield _row_to_scooter(row, key, columns)
+
+        if len(rows) < page_size:
+            return
+        after_id = rows[-1][0]
+
+
+TELEMETRY_OPERATORS = ('<', '<=', '=', '!=', '>=', '>')
+
+class Column:
+    """A filter value that refers to another telemetry column, e.g. ('soc', '<', Column('soc_range_min'))."""
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+def filter_scooters(conditions, fields=None, limit=None):
+    """
+    Scooters matching all (column, operator, value) conditions on telemetry columns,
+    evaluated by SQLite, e.g. [('soc', '<', 20), ('out_of_service', '=', 0)].
+    Only the matching rows are fetched; `fields` projects what gets decrypted.
+    """
+    if not PLAINTEXT_TELEMETRY:
+        raise ValueError("Filtering on telemetry needs PLAINTEXT_TELEMETRY")
+    clauses = []
+    values = []
+    for column, operator, value in conditions:
+        # Column names and operators end up in SQL, so only whitelisted ones are accepted
+        if column not in TELEMETRY_COLUMNS or operator not in TELEMETRY_OPERATORS:
+            raise ValueError(f"Unsupported scooter filter: {column} {operator}")
+        if isinstance(value, Column):
+            if value.name not in TELEMETRY_COLUMNS:
+                raise ValueError(f"Unsupported scooter filter: {column} {operator} {value.name}")
+            clauses.append(f"{column} {operator} {value.name}")
+        else:
+            clauses.append(f"{column} {operator} ?")
+            values.append(telemetry_value(column, value))
+
+    columns = _projected_columns(fields)
+    sql = f"SELECT id, {', '.join(columns)} FROM scooters"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY id"
+    if limit:
+        sql += " LIMIT ?"
+        values.append(int(limit))
+
+    conn = open_connection()
+    cursor = conn.cursor()
+    key = load_symmetric_key()
+    try:
+        cursor.execute(sql, values)
+        return [_row_to_scooter(row, key, columns) for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        print(f"An error occurred while filtering scooters: {e}")
+        return []
+    finally:
+        close_connection(conn)
+
+
+def get_scooter_by_id(scooter_id, fields=None):
+    columns = _projected_columns(fields)
+    conn = open_connection()
+    cursor = conn.cursor()
+    key = load_symmetric_key()
+    try:
+        cursor.execute(f"SELECT id, {', '.join(columns)} FROM scooters WHERE id = ?", (scooter_id,))
+        row = cursor.fetchone()
+        return _row_to_scooter(row, key, columns) if row else None
+    except sqlite3.Error as e:
+        print(f"An error occurred while fetching scooter by id: {e}")
+        return None
+    finally:
+        close_connection(conn)
+
 
 def delete_scooter(serial_number):
     conn = open_connection()
@@ -120,6 +254,7 @@ def delete_scooter(serial_number):
                 # If we find a match, delete based on ID (primary key)
                 cursor.execute('DELETE FROM scooters WHERE id = ?', (id,))
                 conn.commit()
+                events.publish("scooter", events.DELETED, id, {'serial_number': serial_number})
                 print(f"Scooter met id {id} en serienummer {serial_number} is verwijderd.")
                 return True
                 
@@ -131,7 +266,8 @@ def delete_scooter(serial_number):
     finally:
         close_connection(conn)
 
-def update_scooter(scooter_id, fields: dict):
+def update_scooter(scooter_id, fields: dict, expected_version=None):
+    """Update fields of a scooter; with expected_version a concurrent change raises VersionConflictError."""
     conn = open_connection()
     cursor = conn.cursor()
     key = load_symmetric_key()
@@ -140,23 +276,14 @@ def update_scooter(scooter_id, fields: dict):
         encrypted_fields = {}
 
         for field_name, field_value in fields.items():
-            if isinstance(field_value, str):
-                encrypted_fields[field_name] = encrypt_message(field_value, key)
-            else:
-                # For non-string values like boolean or int, convert to string
-                encrypted_fields[field_name] = encrypt_message(str(field_value), key)
+            # Telemetry is stored typed; everything else is encrypted as a string
+            encrypted_fields[field_name] = _stored_value(field_name, field_value, key)
 
         set_clause = ', '.join(f"{key} = ?" for key in encrypted_fields.keys())
-        values = list(encrypted_fields.values())
-        values.append(scooter_id)
-
-        cursor.execute(f'''
-            UPDATE scooters
-            SET {set_clause}
-            WHERE id = ?
-        ''', values)
-        
+        versioned_update(cursor, "scooters", scooter_id, set_clause, encrypted_fields.values(), expected_version)
+
         conn.commit()
+        events.publish("scooter", events.UPDATED, scooter_id, fields)
         return True
     except sqlite3.Error as e:
         print(f"An error occurred while updating scooter: {e}")
@@ -165,6 +292,10 @@ def update_scooter(scooter_id, fields: dict):
         close_connection(conn)
 
 def get_scooter_by_serial_number(serial_number):
+    from models.read_model import read_model
+    if read_model.is_loaded("scooter"):
+        return read_model.scooter_by_serial(serial_number)
+
     conn = open_connection()
     cursor = conn.cursor()
     key = load_symmetric_key()
@@ -185,31 +316,13 @@ def get_scooter_by_serial_number(serial_number):
             return None  # No match found
 
         # Step 2: only retrieve this scooter
-        cursor.execute('SELECT * FROM scooters WHERE id = ?', (matched_id,))
+        cursor.execute(f"SELECT id, {', '.join(SCOOTER_COLUMNS)} FROM scooters WHERE id = ?", (matched_id,))
         row = cursor.fetchone()
         if not row:
             return None
 
-        # Decrypt all fields only here
-        brand = decrypt_message(row[1], key)
-        model = decrypt_message(row[2], key)
-        serial_number_dec = decrypt_message(row[3], key)
-        top_speed = decrypt_message(row[4], key)
-        battery_capacity = decrypt_message(row[5], key)
-        soc = decrypt_message(row[6], key)
-        soc_range_min = decrypt_message(row[7], key)
-        soc_range_max = decrypt_message(row[8], key)
-        location_latitude = decrypt_message(row[9], key)
-        location_longitude = decrypt_message(row[10], key)
-        out_of_service = decrypt_message(row[11], key) == 'True'
-        mileage = decrypt_message(row[12], key)
-        last_maintenance_date = decrypt_message(row[13], key) if row[13] else None
-
-        return Scooter(
-            matched_id, brand, model, serial_number_dec, top_speed, battery_capacity, soc,
-            soc_range_min, soc_range_max, location_latitude, location_longitude,
-            out_of_service, mileage, last_maintenance_date
-        )
+        # Remaining fields are decrypted only when they are used
+        return _row_to_scooter(row, key)
 
     except sqlite3.Error as e:
         log_instance.addlog("Scooter", "Get by serial number failed", f"Serial: {serial_number}", suspicious=True)
@@ -219,7 +332,17 @@ def get_scooter_by_serial_number(serial_number):
         close_connection(conn)
   
 
-def search_scooters_partial(query):
+def search_scooters_partial(query, limit=None):
+    """
+    Scooters whose brand, model or serial number contains `query` (case-insensitive).
+    One streaming pass: every row is fetched once with all columns, only the match columns
+    are decrypted for the check (stopping at the first that matches), and the remaining
+    fields of a hit stay encrypted until they are read. Stops after `limit` hits.
+    """
+    from models.read_model import read_model
+    if read_model.is_loaded("scooter"):
+        return read_model.search_scooters(query, limit)
+
     conn = open_connection()
     cursor = conn.cursor()
     key = load_symmetric_key()
@@ -228,40 +351,13 @@ def search_scooters_partial(query):
         query = query.lower()
         results = []
 
-        # Only retrieve fields that are needed for matching
-        cursor.execute("SELECT id, brand, model, serial_number FROM scooters")
-        basic_rows = cursor.fetchall()
-
-        # First only decrypt and check the important fields
-        for row in basic_rows:
-            id = row[0]
-            brand = decrypt_message(row[1], key)
-            model = decrypt_message(row[2], key)
-            serial = decrypt_message(row[3], key)
-
-            if query in brand.lower() or query in model.lower() or query in serial.lower():
-                # On a match, retrieve all fields for this scooter
-                cursor.execute("SELECT * FROM scooters WHERE id = ?", (id,))
-                full_row = cursor.fetchone()
-
-                if full_row:
-                    scooter = Scooter(
-                        id=full_row[0],
-                        brand=brand,
-                        model=model,
-                        serial_number=serial,
-                        top_speed=decrypt_message(full_row[4], key),
-                        battery_capacity=decrypt_message(full_row[5], key),
-                        soc=decrypt_message(full_row[6], key),
-                        soc_range_min=decrypt_message(full_row[7], key),
-                        soc_range_max=decrypt_message(full_row[8], key),
-                        location_latitude=decrypt_message(full_row[9], key),
-                        location_longitude=decrypt_message(full_row[10], key),
-                        out_of_service=(decrypt_message(full_row[11], key) == "True"),
-                        mileage=decrypt_message(full_row[12], key),
-                        last_maintenance_date=decrypt_message(full_row[13], key) if full_row[13] else None
-                    )
-                    results.append(scooter)
+        cursor.execute(f"SELECT id, {', '.join(SCOOTER_COLUMNS)} FROM scooters ORDER BY id")
+        for row in cursor:
+            scooter = _row_to_scooter(row, key)
+            if query in scooter.brand.lower() or query in scooter.model.lower() or query in scooter.serial_number.lower():
+                results.append(scooter)
+                if limit and len(results) >= limit:
+                    break
 
         return results
 
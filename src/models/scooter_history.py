@@ -0,0 +1,181 @@
+"""
+Append-only scooter state history.
+Every change to a scooter's SOC, mileage or location appends one compact row
+(integer timestamp, plaintext SOC/mileage, encrypted location) to scooter_history.
+Rows are indexed on (scooter_id, recorded_at), so a time series for one scooter never
+touches the rows of other scooters. A retention job folds raw points older than a few
+days into hourly rows holding the SOC min/max and the last values of the hour.
+"""
+import sqlite3
+import time
+from datetime import datetime
+from itertools import groupby
+
+from models.db import open_connection, close_connection
+from models import events
+from models.scooter import get_scooter_by_id
+from security.encryption import encrypt_message, decrypt_message, load_symmetric_key
+
+HISTORY_FIELDS = ('soc', 'mileage', 'location_latitude', 'location_longitude')
+RAW_RETENTION_DAYS = 7
+DOWNSAMPLE_BUCKET_SECONDS = 3600
+
+# bucket_seconds of a row that holds a single recorded change
+RAW = 0
+
+
+class HistoryPoint:
+    __slots__ = ('recorded_at', 'bucket_seconds', 'soc', 'soc_min', 'soc_max', 'mileage',
+                 'location_latitude', 'location_longitude')
+
+    def __init__(self, recorded_at, bucket_seconds, soc, soc_min, soc_max, mileage, location_latitude, location_longitude):
+        self.recorded_at = recorded_at
+        self.bucket_seconds = bucket_seconds
+        self.soc = soc
+        self.soc_min = soc_min
+        self.soc_max = soc_max
+        self.mileage = mileage
+        self.location_latitude = location_latitude
+        self.location_longitude = location_longitude
+
+
+def _timestamp(moment):
+    if moment is None or isinstance(moment, (int, float)):
+        return moment
+    return int(moment.timestamp())
+
+
+def _latest_state(cursor, scooter_id):
+    cursor.execute('''
+        SELECT soc, mileage, location FROM scooter_history
+        WHERE scooter_id = ? ORDER BY recorded_at DESC, id DESC LIMIT 1
+    ''', (scooter_id,))
+    return cursor.fetchone()
+
+
+def record_state(scooter_id, fields, recorded_at=None):
+    """
+    Append the state after a change. Values missing from `fields` are carried over from the
+    previous history row (or read from the scooter for its first row).
+    """
+    conn = open_connection()
+    cursor = conn.cursor()
+    key = load_symmetric_key()
+    try:
+        previous = _latest_state(cursor, scooter_id)
+        if previous is None and not all(field in fields for field in HISTORY_FIELDS):
+            scooter = get_scooter_by_id(scooter_id, fields=HISTORY_FIELDS)
+            if scooter is None:
+                return False
+            current = {field: getattr(scooter, field) for field in HISTORY_FIELDS}
+            location = None
+        elif previous is not None:
+            current = {'soc': previous[0], 'mileage': previous[1]}
+            location = previous[2]
+        else:
+            current = {}
+            location = None
+        current.update({field: fields[field] for field in HISTORY_FIELDS if field in fields})
+
+        # The encrypted location is copied as-is unless one of the coordinates changed
+        if location is None or 'location_latitude' in fields or 'location_longitude' in fields:
+            if 'location_latitude' not in current or 'location_longitude' not in current:
+                latitude, longitude = decrypt_message(location, key).split(",")
+                current.setdefault('location_latitude', latitude)
+                current.setdefault('location_longitude', longitude)
+            location = encrypt_message(f"{current['location_latitude']},{current['location_longitude']}", key)
+
+        soc = int(current['soc'])
+        cursor.execute('''
+            INSERT INTO scooter_history (scooter_id, recorded_at, bucket_seconds, soc, soc_min, soc_max, mileage, location)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (scooter_id, _timestamp(recorded_at) or int(time.time()), RAW, soc, soc, soc, int(current['mileage']), location))
+        conn.commit()
+        return True
+    except sqlite3.Error as e:
+        print(f"An error occurred while recording scooter history: {e}")
+        return False
+    finally:
+        close_connection(conn)
+
+
+def _on_scooter_change(action, scooter_id, fields):
+    if action == events.CREATED or (action == events.UPDATED and any(field in fields for field in HISTORY_FIELDS)):
+        record_state(scooter_id, fields)
+
+
+def start_recording():
+    """Record history for every scooter change made from now on."""
+    events.unsubscribe("scooter", _on_scooter_change)
+    events.subscribe("scooter", _on_scooter_change)
+
+
+def get_scooter_history(scooter_id, start=None, end=None):
+    """
+    History points of one scooter with start <= recorded_at <= end (datetimes or unix
+    seconds, both optional), oldest first. Only the returned rows are decrypted.
+    """
+    conn = open_connection()
+    cursor = conn.cursor()
+    key = load_symmetric_key()
+    try:
+        cursor.execute('''
+            SELECT recorded_at, bucket_seconds, soc, soc_min, soc_max, mileage, location
+            FROM scooter_history
+            WHERE scooter_id = ? AND recorded_at >= ? AND recorded_at <= ?
+            ORDER BY recorded_at, id
+        ''', (scooter_id, _timestamp(start) or 0, _timestamp(end) or int(time.time())))
+        points = []
+        for recorded_at, bucket_seconds, soc, soc_min, soc_max, mileage, location in cursor.fetchall():
+            latitude, longitude = decrypt_message(location, key).split(",")
+            points.append(HistoryPoint(datetime.fromtimestamp(recorded_at), bucket_seconds, soc, soc_min, soc_max,
+                                       mileage, latitude, longitude))
+        return points
+    except sqlite3.Error as e:
+        print(f"An error occurred while reading scooter history: {e}")
+        return []
+    finally:
+        close_connection(conn)
+
+
+def downsample_history(older_than_days=RAW_RETENTION_DAYS, bucket_seconds=DOWNSAMPLE_BUCKET_SECONDS, now=None):
+    """
+    Replace raw rows older than the cutoff by one row per scooter per bucket holding the
+    SOC min/max and the last SOC, mileage and location of that bucket.
+    Runs in a single transaction and never decrypts anything. Returns the number of rows removed.
+    """
+    now = _timestamp(now) or int(time.time())
+    # Align the cutoff to a bucket boundary so no bucket is split between raw and folded rows
+    cutoff = (now - older_than_days * 86400) // bucket_seconds * bucket_seconds
+    conn = open_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            SELECT scooter_id, recorded_at, soc, mileage, location FROM scooter_history
+            WHERE bucket_seconds = ? AND recorded_at < ?
+            ORDER BY scooter_id, recorded_at, id
+        ''', (RAW, cutoff))
+        rows = cursor.fetchall()
+        if not rows:
+            return 0
+
+        folded = []
+        for (scooter_id, bucket), points in groupby(rows, key=lambda row: (row[0], row[1] // bucket_seconds)):
+            points = list(points)
+            socs = [point[2] for point in points]
+            last = points[-1]
+            folded.append((scooter_id, bucket * bucket_seconds, bucket_seconds, last[2], min(socs), max(socs), last[3], last[4]))
+
+        cursor.execute("DELETE FROM scooter_history WHERE bucket_seconds = ? AND recorded_at < ?", (RAW, cutoff))
+        cursor.executemany('''
+            INSERT INTO scooter_history (scooter_id, recorded_at, bucket_seconds, soc, soc_min, soc_max, mileage, location)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', folded)
+        conn.commit()
+        return len(rows) - len(folded)
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"An error occurred while downsampling scooter history: {e}")
+        return 0
+    finally:
+        close_connection(conn)
@@ -0,0 +1,97 @@
+"""
+Bloom filter over scooter serial numbers.
+Checking that a new serial number is unused normally means decrypting every serial in
+the table. The filter answers "definitely not in use" from memory; only a possible hit
+goes to the exact lookup. It is built once from the serial numbers, extended from change
+events, and rebuilt when deletes/renames have left too many stale entries or when another
+process changed the serial numbers (the scooter_serials change counter, bumped by triggers
+on insert, delete and serial number updates only).
+"""
+from models.db import open_connection, close_connection, read_change_counters
+from models import events
+from models.scooter import iter_scooters, get_scooter_by_serial_number
+from helpers.bloom_filter import BloomFilter
+
+SERIAL_FILTER_CAPACITY = 100000
+SERIAL_FILTER_FALSE_POSITIVE_RATE = 0.01
+# Optional hard cap on the filter size in bytes (None: sized from capacity and rate)
+SERIAL_FILTER_MAX_BYTES = None
+# Rebuild once this share of the entries belongs to deleted or renamed scooters
+REBUILD_STALE_FRACTION = 0.25
+BUILD_PAGE_SIZE = 1000
+
+
+class SerialNumberFilter:
+    def __init__(self, capacity=SERIAL_FILTER_CAPACITY, false_positive_rate=SERIAL_FILTER_FALSE_POSITIVE_RATE,
+                 max_bytes=SERIAL_FILTER_MAX_BYTES):
+        self.capacity = capacity
+        self.false_positive_rate = false_positive_rate
+        self.max_bytes = max_bytes
+        self.bloom = None
+        self._stale = 0
+        self._conn = None
+        self._serial_changes = None
+
+    def build(self):
+        from models.read_model import read_model
+        if read_model.is_loaded("scooter"):
+            serials = list(read_model.scooters_by_serial)
+        else:
+            serials = [scooter.serial_number for scooter in iter_scooters(page_size=BUILD_PAGE_SIZE, fields=['serial_number'])]
+
+        self.bloom = BloomFilter(max(self.capacity, 2 * len(serials)), self.false_positive_rate, self.max_bytes)
+        for serial_number in serials:
+            self.bloom.add(serial_number)
+        self._stale = 0
+
+        if self._conn is None:
+            self._conn = open_connection()
+        self._serial_changes = self._read_serial_changes()
+        events.unsubscribe("scooter", self._on_scooter_change)
+        events.subscribe("scooter", self._on_scooter_change)
+
+    def close(self):
+        events.unsubscribe("scooter", self._on_scooter_change)
+        close_connection(self._conn)
+        self._conn = None
+        self.bloom = None
+
+    def _read_serial_changes(self):
+        return read_change_counters(self._conn, ('scooter_serials',))
+
+    def _refresh_if_stale(self):
+        if self._read_serial_changes() != self._serial_changes:
+            self.build()
+
+    def _on_scooter_change(self, action, scooter_id, fields):
+        # SOC, location and other edits leave the serial numbers (and the counter) alone
+        if self.bloom is None or (action == events.UPDATED and 'serial_number' not in fields):
+            return
+        if action == events.DELETED:
+            self._stale += 1
+        elif 'serial_number' in fields:
+            if action == events.UPDATED:
+                self._stale += 1
+            self.bloom.add(str(fields['serial_number']))
+
+        if self._stale > REBUILD_STALE_FRACTION * max(self.bloom.count, 1) or self.bloom.count > self.bloom.capacity:
+            self.build()
+        else:
+            self._serial_changes = self._read_serial_changes()
+
+    def might_contain(self, serial_number):
+        """False means the serial number is certainly unused."""
+        if self.bloom is None:
+            self.build()
+        self._refresh_if_stale()
+        return serial_number in self.bloom
+
+
+serial_filter = SerialNumberFilter()
+
+
+def find_scooter_by_serial_number(serial_number):
+    """Like get_scooter_by_serial_number, but skips the database for serials the filter rules out."""
+    if not serial_filter.might_contain(serial_number):
+        return None
+    return get_scooter_by_serial_number(serial_number)
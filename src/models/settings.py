@@ -0,0 +1,31 @@
+"""Small key/value store for system settings that must survive restarts (e.g. the bcrypt cost)."""
+import sqlite3
+from models.db import open_connection, close_connection
+
+
+def get_setting(name, default=None):
+    conn = open_connection()
+    try:
+        row = conn.execute("SELECT value FROM settings WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else default
+    except sqlite3.Error:
+        # Databases restored from before the settings table existed
+        return default
+    finally:
+        close_connection(conn)
+
+
+def set_setting(name, value):
+    conn = open_connection()
+    try:
+        conn.execute(
+            "INSERT INTO settings (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+            (name, str(value))
+        )
+        conn.commit()
+        return True
+    except sqlite3.Error as e:
+        print(f"An error occurred while saving setting {name}: {e}")
+        return False
+    finally:
+        close_connection(conn)
@@ -1,13 +1,23 @@
 import sqlite3
 import os
-from models.db import open_connection, close_connection
-from security.encryption import encrypt_message, decrypt_message, load_symmetric_key
+from models.db import open_connection, close_connection, versioned_update
+from models.entity import LazyEntity
+from models import events
+from security.encryption import encrypt_message, load_symmetric_key
 from controllers.rolecheck import is_authorized
 from datetime import datetime
 
 
-class Traveller:
-    def __init__(self, id, first_name, last_name, date_of_birth, gender, streetname, house_number, zipcode,  city, email, phone_number, license_number, registration_date):
+class Traveller(LazyEntity):
+    __slots__ = (
+        'id', 'first_name', 'last_name', 'date_of_birth', 'gender', 'streetname', 'house_number',
+        'zip_code', 'city', 'email', 'phone_number', 'license_number', 'registration_date', 'version'
+    )
+
+    _attribute_columns = {'streetname': 'street'}
+
+    def __init__(self, id, first_name, last_name, date_of_birth, gender, streetname, house_number, zipcode,  city, email, phone_number, license_number, registration_date, version=None):
+        self._raw = None
         self.id = id
         self.first_name = first_name
         self.last_name = last_name
@@ -21,6 +31,7 @@ class Traveller:
         self.phone_number = phone_number
         self.license_number = license_number
         self.registration_date = registration_date
+        self.version = version
 
 
 def create_traveller(first_name, last_name, date_of_birth, gender, street, house_number, zip_code, city, email, phone_number, license_number):
@@ -51,6 +62,11 @@ def create_traveller(first_name, last_name, date_of_birth, gender, street, house
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (first_name_enc, last_name_enc, date_of_birth_enc, gender_enc, street_enc, house_number_enc, zip_code_enc, city_enc, email_enc, phone_number_enc, license_number_enc, registration_date_enc))
         conn.commit()
+        events.publish("traveller", events.CREATED, cursor.lastrowid, {
+            'first_name': first_name, 'last_name': last_name, 'date_of_birth': date_of_birth, 'gender': gender,
+            'street': street, 'house_number': house_number, 'zip_code': zip_code, 'city': city, 'email': email,
+            'phone_number': phone_number, 'license_number': license_number, 'registration_date': date_time_now1
+        })
         return True
     except sqlite3.Error as e:
         print(f"An error occurred while creating traveller: {e}")
@@ -59,114 +75,144 @@ def create_traveller(first_name, last_name, date_of_birth, gender, street, house
         close_connection(conn)
 
 
-def list_travellers(current_user):
+PAGE_SIZE = 50
+
+# Columns in table order (without id); also the names accepted by the `fields` projection
+TRAVELLER_COLUMNS = (
+    'first_name', 'last_name', 'date_of_birth', 'gender', 'street', 'house_number',
+    'zip_code', 'city', 'email', 'phone_number', 'license_number', 'registration_date', 'version'
+)
+
+def _projected_columns(fields):
+    """Return the requested columns in table order, rejecting unknown names (they end up in SQL)."""
+    if not fields:  # None or empty: all columns
+        return TRAVELLER_COLUMNS
+    unknown = set(fields) - set(TRAVELLER_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown traveller field(s): {', '.join(sorted(unknown))}")
+    return tuple(column for column in TRAVELLER_COLUMNS if column in fields)
+
+def _row_to_traveller(row, key, columns=TRAVELLER_COLUMNS):
+    """
+    Wrap an (id, *columns) row in a Traveller that decrypts each field on first access.
+    Fields outside the projection read as None.
+    """
+    return Traveller.from_row(row, columns, key)
+
+def list_travellers(current_user, fields=None):
         if not is_authorized(current_user.role, 'list_travellers'):
             print("You do not have permission to view travellers.")
             return
 
+        columns = _projected_columns(fields)
         conn = open_connection()
         cursor = conn.cursor()
         key = load_symmetric_key()  # Ensure the symmetric key is loaded for decryption
 
         try:
-            cursor.execute('SELECT * FROM travellers')
+            cursor.execute(f"SELECT id, {', '.join(columns)} FROM travellers")
             rows = cursor.fetchall()
-            travellers = []
-
-            for row in rows:
-                id = row[0]
-                first_name = decrypt_message(row[1], key)
-                last_name = decrypt_message(row[2], key)
-                date_of_birth = decrypt_message(row[3], key)
-                gender = decrypt_message(row[4], key)
-                streetname = decrypt_message(row[5], key)
-                house_number = decrypt_message(row[6], key)
-                zipcode = decrypt_message(row[7], key)
-                city = decrypt_message(row[8], key)
-                email = decrypt_message(row[9], key)
-                phone_number = decrypt_message(row[10], key)
-                license_number = decrypt_message(row[11], key)
-                registration_date = decrypt_message(row[12], key)
-
-                traveller = Traveller(
-                id, first_name, last_name, date_of_birth, gender, 
-                streetname, house_number, zipcode, city, 
-                email, phone_number, license_number, registration_date
-                )
-                travellers.append(traveller)
-              
-            return travellers
+            return [_row_to_traveller(row, key, columns) for row in rows]
         except sqlite3.Error as e:
             print(f"An error occurred while listing travellers: {e}")
             return []
         finally:
             close_connection(conn)
 
-def find_travellers(query):
+def iter_travellers(current_user, page_size=PAGE_SIZE, after_id=0, fields=None):
+    """
+    Yield travellers ordered by id using keyset pagination.
+    Rows are fetched one page at a time and decrypted only when they are yielded.
+    With `fields` only those columns are selected and decrypted.
+    """
+    if not is_authorized(current_user.role, 'list_travellers'):
+        print("You do not have permission to view travellers.")
+        return
+
+    columns = _projected_columns(fields)
+    key = load_symmetric_key()
+    while True:
+        conn = open_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT id, {', '.join(columns)} FROM travellers WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id, page_size)
+            )
+            rows = cursor.fetchall()
+        except sqlite3.Error as e:
+            print(f"An error occurred while listing travellers: {e}")
+            return
+        finally:
+            close_connection(conn)
+
+        for row in rows:
+            yield _row_to_traveller(row, key, columns)
+
+        if len(rows) < page_size:
+            return
+        after_id = rows[-1][0]
+
+def get_traveller_by_id(traveller_id, fields=None):
+    columns = _projected_columns(fields)
+    conn = open_connection()
+    cursor = conn.cursor()
+    key = load_symmetric_key()
+    try:
+        cursor.execute(f"SELECT id, {', '.join(columns)} FROM travellers WHERE id = ?", (traveller_id,))
+        row = cursor.fetchone()
+        return _row_to_traveller(row, key, columns) if row else None
+    except sqlite3.Error as e:
+        print(f"An error occurred while fetching traveller by id: {e}")
+        return None
+    finally:
+        close_connection(conn)
+
+def _traveller_to_dict(traveller):
+    return {
+        'id': str(traveller.id),
+        'first_name': traveller.first_name,
+        'last_name': traveller.last_name,
+        'date_of_birth': traveller.date_of_birth,
+        'gender': traveller.gender,
+        'street': traveller.streetname,
+        'house_number': traveller.house_number,
+        'zip_code': traveller.zip_code,
+        'city': traveller.city,
+        'email': traveller.email,
+        'phone_number': traveller.phone_number,
+        'license_number': traveller.license_number,
+        'registration_date': traveller.registration_date
+    }
+
+_SEARCH_ATTRIBUTES = ('id', 'first_name', 'last_name', 'streetname', 'email', 'license_number')
+
+def find_travellers(query, limit=None):
+    """
+    Travellers whose id, name, street, email or license number contains `query`.
+    Single streaming pass like search_scooters_partial: match columns are decrypted one by
+    one until one matches, the other fields only for hits. Stops after `limit` hits.
+    """
+    from models.read_model import read_model
+    if read_model.is_loaded("traveller"):
+        return [_traveller_to_dict(t) for t in read_model.find_travellers(query, limit)]
+
     conn = open_connection()
     cursor = conn.cursor()
     key = load_symmetric_key()
 
     try:
-        # Step 1: only retrieve the necessary fields for searching
-        cursor.execute("""
-            SELECT id, first_name, last_name, street, email, license_number
-            FROM travellers
-        """)
-        rows = cursor.fetchall()
         query = query.lower()
-        matched_ids = []
-
-        for row in rows:
-            decrypted = {
-                "id": str(row[0]),
-                "first_name": decrypt_message(row[1], key),
-                "last_name": decrypt_message(row[2], key),
-                "street": decrypt_message(row[3], key),
-                "email": decrypt_message(row[4], key),
-                "license_number": decrypt_message(row[5], key)
-            }
-
-            searchable_values = [
-                decrypted['id'], 
-                decrypted['first_name'], 
-                decrypted['last_name'], 
-                decrypted['street'], 
-                decrypted['email'], 
-                decrypted['license_number']
-            ]
-
-            if any(query in str(value).lower() for value in searchable_values):
-                matched_ids.append(row[0])
-
-        # Step 2: only retrieve details of matches
         results = []
-        for traveller_id in matched_ids:
-            cursor.execute("""
-                SELECT id, first_name, last_name, date_of_birth, gender,
-                       street, house_number, zip_code, city,
-                       email, phone_number, license_number, registration_date
-                FROM travellers WHERE id = ?
-            """, (traveller_id,))
-            row = cursor.fetchone()
-            if not row:
-                continue
-            traveller = {
-                'id': str(row[0]),
-                'first_name': decrypt_message(row[1], key),
-                'last_name': decrypt_message(row[2], key),
-                'date_of_birth': decrypt_message(row[3], key),
-                'gender': decrypt_message(row[4], key),
-                'street': decrypt_message(row[5], key),
-                'house_number': decrypt_message(row[6], key),
-                'zip_code': decrypt_message(row[7], key),
-                'city': decrypt_message(row[8], key),
-                'email': decrypt_message(row[9], key),
-                'phone_number': decrypt_message(row[10], key),
-                'license_number': decrypt_message(row[11], key),
-                'registration_date': decrypt_message(row[12], key)
-            }
-            results.append(traveller)
+
+        cursor.execute(f"SELECT id, {', '.join(TRAVELLER_COLUMNS)} FROM travellers ORDER BY id")
+        for row in cursor:
+            traveller = _row_to_traveller(row, key)
+            # Generator, so the next column is only decrypted when the previous one did not match
+            if any(query in str(getattr(traveller, name)).lower() for name in _SEARCH_ATTRIBUTES):
+                results.append(_traveller_to_dict(traveller))
+                if limit and len(results) >= limit:
+                    break
 
         return results
     except Exception as e:
@@ -175,7 +221,8 @@ def find_travellers(query):
     finally:
         close_connection(conn)
 
-def update_traveller(customer_id, fields: dict):
+def update_traveller(customer_id, fields: dict, expected_version=None):
+    """Update fields of a traveller; with expected_version a concurrent change raises VersionConflictError."""
     conn = open_connection()
     cursor = conn.cursor()
     key = load_symmetric_key()
@@ -190,15 +237,9 @@ def update_traveller(customer_id, fields: dict):
                 encrypted_fields[field_name] = field_value
 
         set_clause = ', '.join(f"{key} = ?" for key in fields.keys())
-        values = list(encrypted_fields.values())
-        values.append(customer_id)
-
-        cursor.execute(f'''
-            UPDATE travellers
-            SET {set_clause}
-            WHERE id = ?
-        ''', values)
+        versioned_update(cursor, "travellers", customer_id, set_clause, encrypted_fields.values(), expected_version)
         conn.commit()
+        events.publish("traveller", events.UPDATED, int(customer_id), fields)
         return True
     except sqlite3.Error as e:
         print(f"An error occurred while updating traveller: {e}")
@@ -214,6 +255,8 @@ def delete_traveller(customer_id):
             DELETE FROM travellers WHERE id = ?
         ''', (customer_id,))
         conn.commit()
+        if cursor.rowcount:
+            events.publish("traveller", events.DELETED, int(customer_id))
         return True
     except sqlite3.Error as e:
         print(f"An error occurred while deleting traveller: {e}")
@@ -1,18 +1,23 @@
-from models.db import open_connection, close_connection
-from security.encryption import encrypt_message, decrypt_message, load_symmetric_key
-from security.password_hashing import hash_password
+from models.db import open_connection, close_connection, versioned_update, VersionConflictError
+from models.entity import LazyEntity
+from models import events
+from security.encryption import encrypt_message, load_symmetric_key, blind_index
+from security.password_hashing import hash_password, password_hasher
 from datetime import datetime
 
-class User:
-    def __init__(self, id, username, firstname, lastname, role, registration_date):
+class User(LazyEntity):
+    __slots__ = ('id', 'username', 'firstname', 'lastname', 'role', 'registration_date', 'version')
+
+    def __init__(self, id, username, firstname, lastname, role, registration_date, version=None):
+        self._raw = None
         self.id = id
         self.firstname = firstname
         self.lastname = lastname
         self.username = username
         self.role = role
         self.registration_date = registration_date
+        self.version = version
 
-    
     def __repr__(self):
         return f"User(id={self.id}, username='{self.username}', role='{self.role}', registration_date='{self.registration_date}')"
     
@@ -23,20 +28,26 @@ def create_user(username, firstname, lastname,  password, role):
         key = load_symmetric_key()
 
         try:
+            # bcrypt runs on a worker while the other fields are encrypted
+            hashed_password = password_hasher.submit_hash(password)
             encrypted_username = encrypt_message(username, key)
             encrypted_firstname = encrypt_message(firstname, key)
             encrypted_lastname = encrypt_message(lastname, key)
             encrypted_role = encrypt_message(role, key)
-            hashed_password = hash_password(password)
             date_time_now1 = datetime.now().strftime('%Y-%m-%d %H:%M:%S')  # Format the date as needed
             date_time_now = encrypt_message(date_time_now1, key)  # Example date, replace with actual date logic
 
             cursor.execute('''
-                INSERT INTO users (username, firstname, lastname, password, role, registration_date)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (encrypted_username, encrypted_firstname, encrypted_lastname, hashed_password, encrypted_role, date_time_now))
+                INSERT INTO users (username, firstname, lastname, password, role, registration_date, username_hash, role_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (encrypted_username, encrypted_firstname, encrypted_lastname, hashed_password.result(), encrypted_role, date_time_now,
+                  blind_index(username, key), blind_index(role, key)))
 
             conn.commit()
+            events.publish("user", events.CREATED, cursor.lastrowid, {
+                'username': username, 'firstname': firstname, 'lastname': lastname,
+                'role': role, 'registration_date': date_time_now1
+            })
             return True
         except Exception as e:
             print(f"Error creating user: {e}")
@@ -44,75 +55,207 @@ def create_user(username, firstname, lastname,  password, role):
         finally:
             close_connection(conn)
 
-def list_users():
+def create_users_bulk(users):
+    """
+    Create users from dicts with username, firstname, lastname, role and password.
+    Passwords are hashed in parallel and all rows are inserted in one transaction with a
+    temporary password, so either every user is created or none. Returns the new ids.
+    """
+    conn = open_connection()
+    cursor = conn.cursor()
+    key = load_symmetric_key()
+
+    try:
+        hashed_passwords = password_hasher.hash_many([user['password'] for user in users])
+        registration_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        user_ids = []
+        for user, hashed_password in zip(users, hashed_passwords):
+            cursor.execute('''
+                INSERT INTO users (username, firstname, lastname, password, role, registration_date, username_hash, role_hash,
+                                   temporary_password)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, 1)
+            ''', (encrypt_message(user['username'], key), encrypt_message(user['firstname'], key),
+                  encrypt_message(user['lastname'], key), hashed_password, encrypt_message(user['role'], key),
+                  encrypt_message(registration_date, key), blind_index(user['username'], key), blind_index(user['role'], key)))
+            user_ids.append(cursor.lastrowid)
+
+        conn.commit()
+        for user_id, user in zip(user_ids, users):
+            events.publish("user", events.CREATED, user_id, {
+                'username': user['username'], 'firstname': user['firstname'], 'lastname': user['lastname'],
+                'role': user['role'], 'registration_date': registration_date
+            })
+        return user_ids
+    except Exception as e:
+        conn.rollback()
+        print(f"Error creating users: {e}")
+        return None
+    finally:
+        close_connection(conn)
+
+def reset_passwords_bulk(passwords_by_id):
+    """
+    Set a temporary password for every user id in the mapping, hashing in parallel and
+    updating in one transaction. Returns True if all users were updated.
+    """
+    conn = open_connection()
+    cursor = conn.cursor()
+
+    try:
+        user_ids = list(passwords_by_id)
+        hashed_passwords = password_hasher.hash_many([passwords_by_id[user_id] for user_id in user_ids])
+        cursor.executemany(
+            'UPDATE users SET password = ?, temporary_password = 1, version = version + 1 WHERE id = ?',
+            list(zip(hashed_passwords, user_ids))
+        )
+        if cursor.rowcount != len(user_ids):
+            conn.rollback()
+            print("Not all users could be found; no passwords were reset.")
+            return False
+
+        conn.commit()
+        for user_id in user_ids:
+            events.publish("user", events.UPDATED, user_id)
+        return True
+    except Exception as e:
+        conn.rollback()
+        print(f"An error occurred while resetting passwords: {e}")
+        return False
+    finally:
+        close_connection(conn)
+
+PAGE_SIZE = 50
+
+# Columns accepted by the `fields` projection (password hashes are never part of a User)
+USER_COLUMNS = ('username', 'firstname', 'lastname', 'role', 'registration_date', 'version')
+
+def _projected_columns(fields):
+    """Return the requested columns in a fixed order, rejecting unknown names (they end up in SQL)."""
+    if not fields:  # None or empty: all columns
+        return USER_COLUMNS
+    unknown = set(fields) - set(USER_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown user field(s): {', '.join(sorted(unknown))}")
+    return tuple(column for column in USER_COLUMNS if column in fields)
+
+def _row_to_user(row, key, columns=USER_COLUMNS):
+    """
+    Wrap an (id, *columns) row in a User that decrypts each field on first access.
+    Fields outside the projection read as None.
+    """
+    return User.from_row(row, columns, key)
+
+def find_user_id(cursor, username, key):
+    """Id of the user with this username (case-insensitive) via the blind index, or None."""
+    cursor.execute('SELECT id FROM users WHERE username_hash = ?', (blind_index(username, key),))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def list_users(fields=None):
     """List all users in the database."""
+    columns = _projected_columns(fields)
+    from models.read_model import read_model
+    if read_model.is_loaded("user"):
+        return read_model.all_users()
+
     conn = open_connection()
     cursor = conn.cursor()
     key = load_symmetric_key()  # Ensure the symmetric key is loaded for decryption
-    
+
     try:
-        cursor.execute('SELECT id, username, firstname, lastname, role, registration_date FROM users')
+        cursor.execute(f"SELECT id, {', '.join(columns)} FROM users")
         rows = cursor.fetchall()
+        return [_row_to_user(row, key, columns) for row in rows]
+    except Exception as e:
+        print(f"An error occurred while listing users: {e}")
+        return []
+    finally:
+        close_connection(conn)
+
+def list_users_by_role(roles, fields=None):
+    """List the users holding any of the given roles, ordered by id."""
+    from models.read_model import read_model
+    if read_model.is_loaded("user"):
+        return read_model.users_with_roles(roles)
+
+    # Indexed lookup on the role blind index; only the matching rows are decrypted
+    columns = _projected_columns(fields)
+    conn = open_connection()
+    cursor = conn.cursor()
+    key = load_symmetric_key()
+    try:
+        role_hashes = [blind_index(role, key) for role in roles]
+        cursor.execute(
+            f"SELECT id, {', '.join(columns)} FROM users WHERE role_hash IN ({', '.join('?' for _ in role_hashes)}) ORDER BY id",
+            role_hashes
+        )
+        return [_row_to_user(row, key, columns) for row in cursor.fetchall()]
+    except Exception as e:
+        print(f"An error occurred while listing users by role: {e}")
+        return []
+    finally:
+        close_connection(conn)
+
+def iter_users(page_size=PAGE_SIZE, after_id=0, fields=None):
+    """Yield users ordered by id, one keyset page at a time, decrypting each row lazily."""
+    columns = _projected_columns(fields)
+    key = load_symmetric_key()
+    while True:
+        conn = open_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT id, {', '.join(columns)} FROM users WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id, page_size)
+            )
+            rows = cursor.fetchall()
+        except Exception as e:
+            print(f"An error occurred while listing users: {e}")
+            return
+        finally:
+            close_connection(conn)
 
-        users = []
         for row in rows:
-            id = row[0]
-            username = decrypt_message(row[1], key)
-            firstname = decrypt_message(row[2], key)
-            lastname = decrypt_message(row[3], key)
-            role = decrypt_message(row[4], key)
-            registration_date = decrypt_message(row[5], key)
+            yield _row_to_user(row, key, columns)
+
+        if len(rows) < page_size:
+            return
+        after_id = rows[-1][0]
 
 
-            users.append(User(id, username, firstname, lastname,  role, registration_date))
-        return users
+def get_user_by_id(user_id, fields=None):
+    columns = _projected_columns(fields)
+    conn = open_connection()
+    cursor = conn.cursor()
+    key = load_symmetric_key()
+    try:
+        cursor.execute(f"SELECT id, {', '.join(columns)} FROM users WHERE id = ?", (user_id,))
+        row = cursor.fetchone()
+        return _row_to_user(row, key, columns) if row else None
     except Exception as e:
-        print(f"An error occurred while listing users: {e}")
-        return []
+        print(f"An error occurred while fetching user by id: {e}")
+        return None
     finally:
         close_connection(conn)
 
 
 def get_user_by_username(username):
+    from models.read_model import read_model
+    if read_model.is_loaded("user"):
+        return read_model.user_by_username(username)
+
     conn = open_connection()
     cursor = conn.cursor()
     key = load_symmetric_key()
 
     try:
-        # Step 1: fetch only username and id (minimal decryption)
-        cursor.execute('SELECT id, username FROM users')
-        rows = cursor.fetchall()
-
-        matched_id = None
-        for row in rows:
-            user_id = row[0]
-            username_dec = decrypt_message(row[1], key)
-            if username_dec.lower() == username.lower():
-                matched_id = user_id
-                break
-
-        if not matched_id:
+        user_id = find_user_id(cursor, username, key)
+        if user_id is None:
             return None
 
-        # Step 2: retrieve all info for this specific user
-        cursor.execute('''
-            SELECT id, username, firstname, lastname, role, registration_date
-            FROM users
-            WHERE id = ?
-        ''', (matched_id,))
-        user_row = cursor.fetchone()
-
-        if user_row:
-            id = user_row[0]
-            username_dec = decrypt_message(user_row[1], key)
-            firstname_dec = decrypt_message(user_row[2], key)
-            lastname_dec = decrypt_message(user_row[3], key)
-            role_dec = decrypt_message(user_row[4], key)
-            registration_date_dec = decrypt_message(user_row[5], key)
-
-            return User(id, username_dec, firstname_dec, lastname_dec, role_dec, registration_date_dec)
-        else:
-            return None
+        cursor.execute(f"SELECT id, {', '.join(USER_COLUMNS)} FROM users WHERE id = ?", (user_id,))
+        row = cursor.fetchone()
+        return _row_to_user(row, key) if row else None
 
     except Exception as e:
         print(f"An error occurred while fetching user by username: {e}")
@@ -128,17 +271,8 @@ def update_password(username, new_password):
     key = load_symmetric_key()  # Ensure the symmetric key is loaded for encryption
     
     try:
-        hashed_password = hash_password(new_password)  # Hash the new password
-        cursor.execute('SELECT id, username from users')
-        rows = cursor.fetchall()
-
-        user_id = None
-        for row in rows:
-            id = row[0]
-            username_dec = decrypt_message(row[1], key)
-            if username_dec == username:
-                user_id = id
-                break
+        hashed_password = password_hasher.submit_hash(new_password)  # Hashed while the user is looked up
+        user_id = find_user_id(cursor, username, key)
 
         if user_id is None:
             print(f"User with username '{username}' not found.")
@@ -146,11 +280,13 @@ def update_password(username, new_password):
         
         cursor.execute('''
             UPDATE users
-            SET password = ?
+            SET password = ?, version = version + 1
             WHERE id = ?
-        ''', (hashed_password, user_id))
+        ''', (hashed_password.result(), user_id))
 
         conn.commit()
+        if cursor.rowcount > 0:
+            events.publish("user", events.UPDATED, user_id)
         return cursor.rowcount > 0  # Return True if the update was successful
     except Exception as e:
         print(f"An error occurred while updating password: {e}")
@@ -164,7 +300,7 @@ def clear_temporary_passwords(user_id):
     conn = open_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute('UPDATE users SET temporary_password = 0 WHERE id = ?', (user_id,))
+        cursor.execute('UPDATE users SET temporary_password = 0, version = version + 1 WHERE id = ?', (user_id,))
         conn.commit()
     finally:
         close_connection(conn)
@@ -178,11 +314,13 @@ def delete_user_by_id(user_id):
     
     conn.commit()
     close_connection(conn)
-    
+
+    if cursor.rowcount > 0:
+        events.publish("user", events.DELETED, user_id)
     return cursor.rowcount > 0  # Return True if the deletion was successful
 
-def update_user_by_id(user_id, fields):
-    """Update user information by ID."""
+def update_user_by_id(user_id, fields, expected_version=None):
+    """Update user information by ID; with expected_version a concurrent change raises VersionConflictError."""
     conn = open_connection()
     cursor = conn.cursor()
     key = load_symmetric_key()  # Load the symmetric key for encryption/decryption
@@ -190,33 +328,60 @@ def update_user_by_id(user_id, fields):
     try:
         # Encrypt the field values
         encrypted_fields = {}
+        pending_hash = None
         for field_name, field_value in fields.items():
-            # Password is handled separately with hash_password
+            # Password is hashed on a worker thread while the other fields are encrypted
             if field_name == 'password':
-                encrypted_fields[field_name] = hash_password(field_value)
+                pending_hash = password_hasher.submit_hash(field_value)
+                encrypted_fields[field_name] = None
             # Other fields are encrypted
             else:
                 encrypted_fields[field_name] = encrypt_message(field_value, key)
-       
+            # Keep the lookup indexes in step with the encrypted username and role
+            if field_name == 'username':
+                encrypted_fields['username_hash'] = blind_index(field_value, key)
+            elif field_name == 'role':
+                encrypted_fields['role_hash'] = blind_index(field_value, key)
+        if pending_hash is not None:
+            encrypted_fields['password'] = pending_hash.result()
+
     
         set_clause = ', '.join(f"{key} = ?" for key in encrypted_fields.keys())
-        values = list(encrypted_fields.values())
-        values.append(user_id)
-        
-        cursor.execute(f'''
-            UPDATE users
-            SET {set_clause}
-            WHERE id = ?
-        ''', values)
-        
+        versioned_update(cursor, "users", user_id, set_clause, encrypted_fields.values(), expected_version)
+
         conn.commit()
+        if cursor.rowcount > 0:
+            events.publish("user", events.UPDATED, user_id, {k: v for k, v in fields.items() if k != 'password'})
         return cursor.rowcount > 0  # Return True if the update was successful
+    except VersionConflictError:
+        raise
     except Exception as e:
         print(f"An error occurred while updating user: {e}")
         return False
     finally:
         close_connection(conn)
 
+def rehash_password_by_id(user_id, password, old_hash):
+    """
+    Hash a just-verified password with the current bcrypt cost on a worker thread and
+    store it. The row is only updated if it still holds old_hash, so a password change
+    made in the meantime is never overwritten. Returns the Future of the new hash.
+    """
+    def store(future):
+        conn = open_connection()
+        try:
+            # Same password, stronger hash: not a change other writers need to know about, so no version bump
+            conn.execute('UPDATE users SET password = ? WHERE id = ? AND password = ?', (future.result(), user_id, old_hash))
+            conn.commit()
+        except Exception as e:
+            print(f"An error occurred while upgrading a password hash: {e}")
+        finally:
+            close_connection(conn)
+
+    future = password_hasher.submit_hash(password)
+    future.add_done_callback(store)
+    return future
+
 # Update password for user and set temporary password flag
 def update_password_by_id(user_id, new_password):
     """Update the password for a user by ID."""
@@ -225,14 +390,16 @@ def update_password_by_id(user_id, new_password):
     
     try:
         hashed_password = hash_password(new_password)  # Hash the new password
-        
+
         cursor.execute('''
             UPDATE users
-            SET password = ?, temporary_password = 1
+            SET password = ?, temporary_password = 1, version = version + 1
             WHERE id = ?
         ''', (hashed_password, user_id))
         
         conn.commit()
+        if cursor.rowcount > 0:
+            events.publish("user", events.UPDATED, user_id)
         return cursor.rowcount > 0  # Return True if the update was successful
     except Exception as e:
         print(f"An error occurred while updating password: {e}")
@@ -246,16 +413,8 @@ def get_user_password_by_username(username):
     key = load_symmetric_key()
 
     try:
-        # Step 1: find user-id via username
-        cursor.execute('SELECT id, username FROM users')
-        rows = cursor.fetchall()
-
-        user_id = None
-        for row in rows:
-            decrypted_username = decrypt_message(row[1], key)
-            if decrypted_username.lower() == username.lower():
-                user_id = row[0]
-                break
+        # Step 1: find user-id via the username index
+        user_id = find_user_id(cursor, username, key)
 
         if user_id is None:
             return None
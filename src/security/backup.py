@@ -119,22 +119,8 @@ class BackupManager:
         base_dir, db_path, backup_dir = BackupManager.get_paths()
 
         # Show a list of system admins to choose from
-        conn = sqlite3.connect('data/urban_mobility.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, username, role FROM users")
-        all_users = cursor.fetchall()
-        conn.close()
-
-        # Filter system admins after decryption
-        system_admins = []
-        for user in all_users:
-            try:
-                decrypted_role = decrypt_message(user[2], key)
-                if decrypted_role == "system_administrator":
-                    decrypted_username = decrypt_message(user[1], key)
-                    system_admins.append((user[0], decrypted_username))
-            except Exception:
-                continue
+        from models.user import list_users_by_role
+        system_admins = [(user.id, user.username) for user in list_users_by_role(["system_administrator"], fields=['username'])]
 
         if not system_admins:
             print("No system admins found.")
@@ -474,18 +460,11 @@ class BackupManager:
         cursor.execute("SELECT id, code, system_admin_id, backup_filename FROM restore_codes")
         all_restore_codes = cursor.fetchall()
         
-        # Get all administrators for displaying names
-        cursor.execute("SELECT id, username FROM users")
-        all_users = cursor.fetchall()
         conn.close()
         
         # Create a lookup table for admin usernames
-        admin_usernames = {}
-        for user_id, username_encrypted in all_users:
-            try:
-                admin_usernames[user_id] = decrypt_message(username_encrypted, key)
-            except Exception:
-                admin_usernames[user_id] = f"User ID {user_id}"
+        from models.user import list_users
+        admin_usernames = {user.id: user.username for user in list_users(fields=['username'])}
         
         # Process and display all restore codes
         if not all_restore_codes:
@@ -0,0 +1,97 @@
+"""
+Temporary passwords for bulk provisioning and the encrypted files that carry them.
+A credentials file holds the generated username/password pairs as CSV, encrypted as a whole
+with the symmetric key, so the plaintext never touches the disk. Each file belongs to the user
+who created it: the name starts with a keyed hash of the creator's id and the encrypted content
+repeats the id, so only the creator can open it. A file is deleted once it has been viewed, or
+after CREDENTIALS_MAX_AGE_DAYS when nobody opens it.
+"""
+import csv
+import io
+import os
+import secrets
+import string
+from datetime import datetime, timedelta
+
+from security.encryption import encrypt_message, decrypt_message, load_symmetric_key, blind_index
+
+TEMPORARY_PASSWORD_LENGTH = 16
+SPECIAL_CHARACTERS = "~!@#$%&_-+=|(){}[]:;<>,.?/"
+CREDENTIALS_MAX_AGE_DAYS = 7
+
+
+def get_credentials_dir():
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_dir, 'credentials')
+
+
+def generate_temporary_password(length=TEMPORARY_PASSWORD_LENGTH):
+    """Random password that meets Validation.password_validation (one of each character class)."""
+    classes = (string.ascii_lowercase, string.ascii_uppercase, string.digits, SPECIAL_CHARACTERS)
+    alphabet = ''.join(classes)
+    characters = [secrets.choice(chars) for chars in classes]
+    characters += [secrets.choice(alphabet) for _ in range(length - len(classes))]
+    secrets.SystemRandom().shuffle(characters)
+    return ''.join(characters)
+
+
+def _creator_prefix(creator, key):
+    return blind_index(str(creator.id), key)[:16]
+
+
+def write_credentials_file(credentials, label, creator):
+    """Encrypt (username, password) pairs into a new file owned by creator and return its path."""
+    key = load_symmetric_key()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(('creator', creator.id))
+    writer.writerow(('username', 'password'))
+    writer.writerows(credentials)
+
+    directory = get_credentials_dir()
+    os.makedirs(directory, exist_ok=True)
+    name = f"{_creator_prefix(creator, key)}_{label}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.enc"
+    path = os.path.join(directory, name)
+    with open(path, 'x') as f:
+        f.write(encrypt_message(buffer.getvalue(), key))
+    return path
+
+
+def read_credentials_file(name, creator):
+    """
+    (username, password) pairs from a file written by write_credentials_file, or None when
+    the file was not created by creator.
+    """
+    with open(os.path.join(get_credentials_dir(), os.path.basename(name))) as f:
+        content = decrypt_message(f.read().strip(), load_symmetric_key())
+    rows = list(csv.reader(io.StringIO(content)))
+    if not rows or rows[0] != ['creator', str(creator.id)]:
+        return None
+    return [tuple(row) for row in rows[2:]]
+
+
+def delete_credentials_file(path):
+    """Remove a credentials file; a file that is already gone is not an error."""
+    try:
+        os.remove(os.path.join(get_credentials_dir(), os.path.basename(path)))
+    except FileNotFoundError:
+        pass
+
+
+def list_credentials_files(creator):
+    """Names of the files created by creator. Files past CREDENTIALS_MAX_AGE_DAYS are deleted."""
+    directory = get_credentials_dir()
+    if not os.path.isdir(directory):
+        return []
+    cutoff = (datetime.now() - timedelta(days=CREDENTIALS_MAX_AGE_DAYS)).timestamp()
+    prefix = _creator_prefix(creator, load_symmetric_key()) + '_'
+    names = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.enc'):
+            continue
+        path = os.path.join(directory, name)
+        if os.path.getmtime(path) < cutoff:
+            delete_credentials_file(path)
+        elif name.startswith(prefix):
+            names.append(name)
+    return names
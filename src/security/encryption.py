@@ -5,6 +5,8 @@ from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.backends import default_backend
 import os
 import base64
+import hashlib
+import hmac
 
 def generate_symmetric_key():
     """
@@ -46,4 +48,13 @@ def decrypt_message(token, key):
     padded_data = decryptor.update(ct) + decryptor.finalize()
     unpadder = padding.PKCS7(128).unpadder()
     message = unpadder.update(padded_data) + unpadder.finalize()
-    return message.decode()
\ No newline at end of file
+    return message.decode()
+
+def blind_index(value, key):
+    """
+    Deterministic keyed hash (HMAC-SHA256) of a value, used to look up rows by an
+    encrypted column with an ordinary index. The HMAC key is derived from the symmetric
+    key, so the index cannot be rebuilt or brute-forced without it. Case-insensitive.
+    """
+    index_key = hmac.new(key, b"blind-index", hashlib.sha256).digest()
+    return hmac.new(index_key, value.strip().lower().encode(), hashlib.sha256).hexdigest()
@@ -0,0 +1,99 @@
+"""
+Login throttling.
+Failed logins are stored in the login_failures table per username (as a keyed hash, never
+in plaintext) and under one global subject, so the state survives restarts and is shared
+by concurrent sessions. Within a sliding window the first few failures are free; after
+that each failure doubles the time until the next attempt is allowed. Checking whether an
+attempt is allowed is one indexed query; nothing ever sleeps.
+"""
+import sqlite3
+import time
+
+from models.db import open_connection, close_connection
+from security.encryption import blind_index, load_symmetric_key
+
+WINDOW_SECONDS = 15 * 60
+# Per username: failures allowed before backoff starts, first delay, and the cap
+USER_FREE_FAILURES = 3
+USER_BASE_DELAY_SECONDS = 30
+USER_MAX_DELAY_SECONDS = 15 * 60
+# All usernames together, against attacks spread over many accounts
+GLOBAL_FREE_FAILURES = 50
+GLOBAL_BASE_DELAY_SECONDS = 5
+GLOBAL_MAX_DELAY_SECONDS = 5 * 60
+
+GLOBAL_SUBJECT = "*"
+# Wait reported when the failure state cannot be read: the throttle fails closed
+UNKNOWN_STATE_DELAY_SECONDS = USER_BASE_DELAY_SECONDS
+
+
+class LoginThrottle:
+    def __init__(self, window_seconds=WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+
+    def _subject(self, username):
+        return blind_index(username or "", load_symmetric_key())
+
+    @staticmethod
+    def _delay(failures, free, base, maximum):
+        if failures < free:
+            return 0
+        return min(base * 2 ** (failures - free), maximum)
+
+    def retry_after(self, username, now=None):
+        """Seconds until `username` may try again; 0 when an attempt is allowed (never when the state is unreadable)."""
+        now = now or time.time()
+        conn = open_connection()
+        try:
+            rows = conn.execute('''
+                SELECT subject, COUNT(*), MAX(failed_at) FROM login_failures
+                WHERE subject IN (?, ?) AND failed_at >= ?
+                GROUP BY subject
+            ''', (self._subject(username), GLOBAL_SUBJECT, now - self.window_seconds)).fetchall()
+        except sqlite3.Error as e:
+            print(f"An error occurred while checking login attempts: {e}")
+            return UNKNOWN_STATE_DELAY_SECONDS
+        finally:
+            close_connection(conn)
+
+        wait = 0
+        for subject, failures, last_failure in rows:
+            if subject == GLOBAL_SUBJECT:
+                delay = self._delay(failures, GLOBAL_FREE_FAILURES, GLOBAL_BASE_DELAY_SECONDS, GLOBAL_MAX_DELAY_SECONDS)
+            else:
+                delay = self._delay(failures, USER_FREE_FAILURES, USER_BASE_DELAY_SECONDS, USER_MAX_DELAY_SECONDS)
+            wait = max(wait, last_failure + delay - now)
+        return max(0, wait)
+
+    def is_allowed(self, username, now=None):
+        return self.retry_after(username, now) == 0
+
+    def record_failure(self, username, now=None):
+        now = now or time.time()
+        conn = open_connection()
+        try:
+            conn.executemany(
+                "INSERT INTO login_failures (subject, failed_at) VALUES (?, ?)",
+                [(self._subject(username), now), (GLOBAL_SUBJECT, now)]
+            )
+            # Rows outside the window no longer count; keep the table small
+            conn.execute("DELETE FROM login_failures WHERE failed_at < ?", (now - self.window_seconds,))
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"An error occurred while recording a failed login: {e}")
+        finally:
+            close_connection(conn)
+
+    def record_success(self, username):
+        """A successful login clears that username's failures (the global count is kept)."""
+        conn = open_connection()
+        try:
+            conn.execute("DELETE FROM login_failures WHERE subject = ?", (self._subject(username),))
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"An error occurred while resetting failed logins: {e}")
+        finally:
+            close_connection(conn)
+
+
+login_throttle = LoginThrottle()
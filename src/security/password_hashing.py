@@ -1,4 +1,63 @@
+import os
+import time
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+
 import bcrypt
+from models.settings import get_setting, set_setting
+
+# bcrypt work factor: used until `--calibrate-bcrypt` stores one tuned to this host
+DEFAULT_BCRYPT_COST = 12
+MIN_BCRYPT_COST = 10
+MAX_BCRYPT_COST = 16
+TARGET_LOGIN_SECONDS = 0.25
+BCRYPT_COST_SETTING = "bcrypt_cost"
+
+_bcrypt_cost = None
+
+def get_bcrypt_cost() -> int:
+    """The configured bcrypt cost, read from the settings table once per process."""
+    global _bcrypt_cost
+    if _bcrypt_cost is None:
+        _bcrypt_cost = int(get_setting(BCRYPT_COST_SETTING, DEFAULT_BCRYPT_COST))
+    return _bcrypt_cost
+
+def set_bcrypt_cost(cost: int) -> None:
+    global _bcrypt_cost
+    set_setting(BCRYPT_COST_SETTING, cost)
+    _bcrypt_cost = cost
+
+def hash_cost(hashed_password: str) -> int | None:
+    """Cost factor encoded in a bcrypt hash ($2b$<cost>$...)."""
+    try:
+        return int(hashed_password.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+def needs_rehash(hashed_password: str) -> bool:
+    return hash_cost(hashed_password) != get_bcrypt_cost()
+
+def calibrate_bcrypt_cost(target_seconds=TARGET_LOGIN_SECONDS):
+    """
+    Benchmark bcrypt on this host and return (cost, seconds) for the highest cost whose
+    hash time stays within target_seconds. Never goes below MIN_BCRYPT_COST.
+    """
+    cost = MIN_BCRYPT_COST
+    seconds = _time_bcrypt(cost)
+    # Each extra round doubles the work, so stop before the next step would overshoot
+    while cost < MAX_BCRYPT_COST and seconds * 2 <= target_seconds:
+        cost += 1
+        seconds = _time_bcrypt(cost)
+    return cost, seconds
+
+def _time_bcrypt(cost, samples=3):
+    salt = bcrypt.gensalt(rounds=cost)
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        bcrypt.hashpw(b"calibration-password", salt)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
 
 def hash_password(password: str) -> str:
 
@@ -6,7 +65,7 @@ def hash_password(password: str) -> str:
     Generates a secure hash of the password using bcrypt with an automatically generated salt.
     Returns: hashed password string (including salt)
     """
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=get_bcrypt_cost())
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')  # store as string in DB
 
@@ -20,4 +79,42 @@ def validate_password(password: str, hashed_password: str) -> bool:
     except ValueError:
         return False
 
-    
\ No newline at end of file
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a pool of worker threads. bcrypt releases the GIL while hashing, so
+    callers can start a hash, do other work (encrypting fields, database lookups) and
+    collect the result later, and many passwords are hashed in parallel across cores.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor = None
+
+    def _pool(self):
+        # Created on first use so importing this module never starts threads
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    def submit_hash(self, password: str):
+        """Start hashing; returns a Future whose result() is the hash string."""
+        return self._pool().submit(hash_password, password)
+
+    def submit_validate(self, password: str, hashed_password: str):
+        """Start a verification; returns a Future whose result() is True or False."""
+        return self._pool().submit(validate_password, password, hashed_password)
+
+    def hash_many(self, passwords):
+        """Hash all passwords in parallel; results are in the same order as the input."""
+        futures = [self.submit_hash(password) for password in passwords]
+        return [future.result() for future in futures]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
+atexit.register(password_hasher.shutdown)
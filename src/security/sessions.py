@@ -0,0 +1,131 @@
+"""
+Session tokens.
+After login an operator can be issued a random token that resumes the session on the next
+launch (`--session`). Only a keyed hash of the token is stored, next to an encrypted
+snapshot of the User, so resuming is one indexed lookup plus one decryption; no bcrypt
+check and no username lookup. Sessions expire after a fixed lifetime or when idle (the main
+loop touches the session after every menu action), are revoked on logout, and all sessions of
+a user are revoked whenever that user changes.
+"""
+import hashlib
+import hmac
+import json
+import secrets
+import sqlite3
+import time
+
+from models.db import open_connection, close_connection
+from models import events
+from models.user import User
+from security.encryption import encrypt_message, decrypt_message, load_symmetric_key
+from logs.log import log_instance
+
+SESSION_LIFETIME_SECONDS = 8 * 60 * 60
+SESSION_IDLE_TIMEOUT_SECONDS = 30 * 60
+
+
+def _token_hash(token, key):
+    # Not blind_index: that one folds case, which would throw away most of a token's entropy
+    token_key = hmac.new(key, b"session-token", hashlib.sha256).digest()
+    return hmac.new(token_key, token.encode(), hashlib.sha256).hexdigest()
+
+
+class SessionStore:
+    def __init__(self, lifetime_seconds=SESSION_LIFETIME_SECONDS, idle_timeout_seconds=SESSION_IDLE_TIMEOUT_SECONDS):
+        self.lifetime_seconds = lifetime_seconds
+        self.idle_timeout_seconds = idle_timeout_seconds
+
+    def issue(self, user):
+        """Create a session for an authenticated user and return its token (shown once)."""
+        key = load_symmetric_key()
+        token = secrets.token_urlsafe(32)
+        now = time.time()
+        snapshot = encrypt_message(json.dumps({
+            'username': user.username, 'firstname': user.firstname, 'lastname': user.lastname,
+            'role': user.role, 'registration_date': user.registration_date
+        }), key)
+        conn = open_connection()
+        try:
+            conn.execute('''
+                INSERT INTO sessions (token_hash, user_id, user_data, created_at, last_used_at, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (_token_hash(token, key), user.id, snapshot, now, now, now + self.lifetime_seconds))
+            # Expired sessions are of no use to anyone
+            conn.execute("DELETE FROM sessions WHERE expires_at < ? OR revoked = 1", (now,))
+            conn.commit()
+            log_instance.addlog(user.username, "Session issued", "", False)
+            return token
+        except sqlite3.Error as e:
+            print(f"An error occurred while creating a session: {e}")
+            return None
+        finally:
+            close_connection(conn)
+
+    def resume(self, token):
+        """The User of a valid session, or None if the token is unknown, revoked, expired or idle."""
+        key = load_symmetric_key()
+        now = time.time()
+        conn = open_connection()
+        try:
+            row = conn.execute('''
+                SELECT id, user_id, user_data, last_used_at, expires_at, revoked
+                FROM sessions WHERE token_hash = ?
+            ''', (_token_hash(token, key),)).fetchone()
+            if not row:
+                log_instance.addlog("unknown", "Session rejected", "Unknown session token", suspicious=True)
+                return None
+            session_id, user_id, user_data, last_used_at, expires_at, revoked = row
+            data = json.loads(decrypt_message(user_data, key))
+            if revoked or now >= expires_at or now - last_used_at >= self.idle_timeout_seconds:
+                reason = "Revoked" if revoked else "Expired" if now >= expires_at else "Idle timeout"
+                log_instance.addlog(data['username'], "Session rejected", f"{reason} session token", suspicious=True)
+                return None
+
+            conn.execute("UPDATE sessions SET last_used_at = ? WHERE id = ?", (now, session_id))
+            conn.commit()
+            log_instance.addlog(data['username'], "Session resumed", f"Session {session_id}", False)
+            return User(user_id, data['username'], data['firstname'], data['lastname'], data['role'], data['registration_date'])
+        except sqlite3.Error as e:
+            print(f"An error occurred while resuming a session: {e}")
+            return None
+        finally:
+            close_connection(conn)
+
+    def touch(self, token):
+        """Record activity on a session, so the idle timeout counts from the last menu action."""
+        conn = open_connection()
+        try:
+            conn.execute("UPDATE sessions SET last_used_at = ? WHERE token_hash = ? AND revoked = 0",
+                         (time.time(), _token_hash(token, load_symmetric_key())))
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"An error occurred while updating the session: {e}")
+        finally:
+            close_connection(conn)
+
+    def revoke(self, token):
+        self._revoke("token_hash = ?", (_token_hash(token, load_symmetric_key()),))
+
+    def revoke_user(self, user_id):
+        self._revoke("user_id = ?", (user_id,))
+
+    def _revoke(self, condition, values):
+        conn = open_connection()
+        try:
+            conn.execute(f"UPDATE sessions SET revoked = 1 WHERE {condition}", values)
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"An error occurred while revoking sessions: {e}")
+        finally:
+            close_connection(conn)
+
+    def _on_user_change(self, action, user_id, fields):
+        # The session holds a snapshot of the user (role included), so any change ends it
+        self.revoke_user(user_id)
+
+    def follow_user_changes(self):
+        events.unsubscribe("user", self._on_user_change)
+        events.subscribe("user", self._on_user_change)
+
+
+session_store = SessionStore()
@@ -1,9 +1,15 @@
 import re
 import sys
 from logs.log import log_instance
+from fleet.geofence import get_geofences
 from datetime import datetime
 
 class Validation:
+    # Service area: Rotterdam bounding box
+    MIN_LATITUDE = 51.85000
+    MAX_LATITUDE = 52.05000
+    MIN_LONGITUDE = 4.40000
+    MAX_LONGITUDE = 4.55000
 
     @staticmethod
     def get_valid_id_input(id: str, username: str):
@@ -263,8 +269,9 @@ class Validation:
                 lat_val = float(latitude)
                 lng_val = float(longitude)
 
-                if 51.85000 <= lat_val <= 52.05000 and 4.40000 <= lng_val <= 4.55000:
-                    return True
+                if (Validation.MIN_LATITUDE <= lat_val <= Validation.MAX_LATITUDE
+                        and Validation.MIN_LONGITUDE <= lng_val <= Validation.MAX_LONGITUDE):
+                    return Validation.geofence_validation(lat_val, lng_val, username)
             except ValueError:
                 pass
 
@@ -272,6 +279,29 @@ class Validation:
         log_instance.log_invalid_input(username, "location", "Invalid GPS coordinates for Rotterdam with required precision")
         return False
         
+    @staticmethod
+    def geofence_validation(latitude, longitude, username):
+        geofences = get_geofences()
+        if not geofences.in_service_area(latitude, longitude):
+            print("Location is outside the service area.")
+            log_instance.log_invalid_input(username, "location", "Location outside the service area")
+            return False
+        zone = geofences.no_parking_zone(latitude, longitude)
+        if zone is not None:
+            print(f"Location is inside the no-parking zone '{zone.name}'.")
+            log_instance.log_invalid_input(username, "location", f"Location inside no-parking zone {zone.name}")
+            return False
+        return True
+
+    @staticmethod
+    def speed_cap_validation(top_speed, latitude, longitude, username):
+        cap = get_geofences().speed_cap(float(latitude), float(longitude))
+        if cap is None or int(top_speed) <= cap:
+            return True
+        print(f"Top speed must be at most {cap} km/h at this location (speed zone).")
+        log_instance.log_invalid_input(username, "top speed", f"Top speed above speed zone cap of {cap}")
+        return False
+
     @staticmethod
     def mileage_validation(mileage, username):
         if re.fullmatch(r"[1-9]\d*|0", mileage):  # 0 of positief geheel getal zonder leading zeros
@@ -1,30 +1,83 @@
+import argparse
+import os
 from models.db import initialize_database
+from models.read_model import read_model
+from models.scooter_history import start_recording, downsample_history
+from models.serial_filter import serial_filter
+from security.password_hashing import calibrate_bcrypt_cost, set_bcrypt_cost, TARGET_LOGIN_SECONDS
+from security.sessions import session_store
 from controllers.auth import login
 from controllers.menus import service_engineer_menu, system_administrator_menu, super_administrator_menu
 
 
+def calibrate_bcrypt(target_ms):
+    cost, seconds = calibrate_bcrypt_cost(target_ms / 1000)
+    set_bcrypt_cost(cost)
+    print(f"bcrypt cost set to {cost} ({seconds * 1000:.0f} ms per hash, target {target_ms} ms).")
+    print("Existing password hashes are upgraded at each user's next login.")
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Urban Mobility backend system")
+    parser.add_argument("--calibrate-bcrypt", action="store_true",
+                        help="benchmark bcrypt on this host, store the highest cost within the target and exit")
+    parser.add_argument("--target-ms", type=int, default=int(TARGET_LOGIN_SECONDS * 1000),
+                        help="target time for one password hash in milliseconds (default: %(default)s)")
+    parser.add_argument("--session", default=os.environ.get("UM_SESSION"),
+                        help="resume a session with a token from --issue-session (or set UM_SESSION)")
+    parser.add_argument("--issue-session", action="store_true",
+                        help="after logging in, print a session token for resuming on the next launch")
+    args = parser.parse_args()
 
     initialize_database()
+    if args.calibrate_bcrypt:
+        calibrate_bcrypt(args.target_ms)
+        return
+    downsample_history()
+    start_recording()
+    serial_filter.build()
+    session_store.follow_user_changes()
+    session_token = args.session
     while True:
         # print("--- DEBUG: User login attempt --")
-        user = login()
+        user = session_store.resume(session_token) if session_token else None
+        if session_token and not user:
+            print("Session is invalid or has expired. Please log in.")
+            session_token = None
         if not user:
-            continue  # login failed, opnieuw proberen
+            user = login()
+            if not user:
+                continue  # login failed, opnieuw proberen
+            if args.issue_session:
+                session_token = session_store.issue(user)
+                if session_token:
+                    print(f"Session token (keep it secret): {session_token}")
+                    print("Resume with --session <token> or UM_SESSION until you log out or it expires.")
+                    input("Press Enter to continue...")
+        read_model.load(user)
         while True:
             # Toon menu voor deze ingelogde user
             role = user.role
-            if role == "service_engineer":
-                stay_logged_in = service_engineer_menu(user)
-            elif role == "system_administrator":
-                stay_logged_in = system_administrator_menu(user)
-            elif role == "super_administrator":
-                stay_logged_in = super_administrator_menu(user)
-            else:
-                print("Unknown role.")
-                stay_logged_in = False
+            try:
+                if role == "service_engineer":
+                    stay_logged_in = service_engineer_menu(user)
+                elif role == "system_administrator":
+                    stay_logged_in = system_administrator_menu(user)
+                elif role == "super_administrator":
+                    stay_logged_in = super_administrator_menu(user)
+                else:
+                    print("Unknown role.")
+                    stay_logged_in = False
+            finally:
+                # Also on exit, so the idle timeout counts from the last action, not from launch
+                if session_token:
+                    session_store.touch(session_token)
 
             if not stay_logged_in:
+                if session_token:
+                    session_store.revoke(session_token)
+                    session_token = None
+                read_model.clear()
                 print("You have been logged out.")
                 break  # terug naar login-prompt
 